@@ -3,9 +3,9 @@
 
 from __future__ import annotations
 
-import argparse
 import json
 import sys
+from typing import NamedTuple
 
 USAGE_TEXT = "Usage: $notifications on|off"
 ALLOWED_COMMANDS = {"on", "off"}
@@ -16,26 +16,42 @@ STATUS_BLOCKED = "blocked"
 STATUS_INVALID_INPUT = "invalid-input"
 STATUS_FAILED = "failed"
 
+# Remediation guidance reused by every blocked/failed result.
+BLOCKED_NEXT_ACTION = (
+    "Add the config directory to sandbox_workspace_write.writable_roots or rerun "
+    "with a policy that permits writing the global Codex config."
+)
+FAILED_NEXT_ACTION = "Inspect the error and rerun after correcting the config or filesystem state."
+
 _STATE_IMPORT_ERROR: Exception | None = None
 
 # Import state helpers once at module load so command execution can fail fast
-# with a clear dependency message if `tomlkit` or the module is unavailable.
+# with a clear message if the module is unavailable. tomlkit itself is only
+# imported once a command needs to edit the config; see dependency_failed_result.
 try:
     from notifications_state import (
         apply_on_state,
         apply_safe_off_without_snapshot,
         apply_snapshot_restore,
+        atomic_write_many,
         capture_prior_state,
+        clear_target_cache,
+        dump_snapshot,
+        dump_toml_document,
+        is_cached_target_on,
+        is_off_readonly,
         is_permission_block,
         is_target_on,
+        is_target_on_readonly,
         load_snapshot,
-        load_toml_document,
-        prepare_config_directory,
+        parse_toml_document,
+        read_config_text,
+        record_target_on,
         remove_snapshot,
         resolve_config_path,
         resolve_notify_script_path,
         resolve_snapshot_path,
-        write_snapshot,
+        resolve_target_cache_path,
         write_toml_document,
     )
 except Exception as exc:  # pragma: no cover - exercised via CLI dependency-failure path
@@ -59,8 +75,8 @@ def build_result(
 
 
 def emit_result(result: dict[str, str]) -> None:
-    # CLI contract: always emit machine-readable JSON.
-    print(json.dumps(result, ensure_ascii=True))
+    # CLI contract: always emit machine-readable JSON, one compact line.
+    sys.stdout.write(json.dumps(result, separators=(",", ":"), ensure_ascii=True) + "\n")
 
 
 def blocked_result(action: str, reason: str) -> dict[str, str]:
@@ -71,10 +87,7 @@ def blocked_result(action: str, reason: str) -> dict[str, str]:
         action=action,
         status=STATUS_BLOCKED,
         rationale=reason,
-        next_action=(
-            "Add the config directory to sandbox_workspace_write.writable_roots or rerun "
-            "with a policy that permits writing the global Codex config."
-        ),
+        next_action=BLOCKED_NEXT_ACTION,
     )
 
 
@@ -85,7 +98,7 @@ def failed_result(action: str, reason: str) -> dict[str, str]:
         action=action,
         status=STATUS_FAILED,
         rationale=reason,
-        next_action="Inspect the error and rerun after correcting the config or filesystem state.",
+        next_action=FAILED_NEXT_ACTION,
     )
 
 
@@ -105,6 +118,46 @@ def result_from_exception(
     return failed_result(action, f"{failed_reason_prefix}: {exc}")
 
 
+def dependency_failed_result(action: str, exc: BaseException) -> dict[str, str]:
+    # Missing runtime dependency: name the install command instead of
+    # reporting a generic read/parse failure.
+    return failed_result(
+        action,
+        "State module dependency initialization failed: "
+        + f"{exc}. Install runtime dependency with 'python3 -m pip install tomlkit'.",
+    )
+
+
+def already_on_result() -> dict[str, str]:
+    # Shared by the parsed check in execute_on and the cached check in
+    # execute_command.
+    return build_result(
+        action="$notifications on",
+        status=STATUS_ALREADY_APPLIED,
+        rationale="Config already matches the v1 notifications-on target state.",
+    )
+
+
+def already_off_result(warning_suffix: str = "") -> dict[str, str]:
+    # Shared by the parsed fallback in execute_off and the unparsed check in
+    # execute_command.
+    return build_result(
+        action="$notifications off",
+        status=STATUS_ALREADY_APPLIED,
+        rationale="Notifications policy is already off and no snapshot restore was required"
+        + warning_suffix
+        + ".",
+    )
+
+
+def recorded_already_on_result(config_path, snapshot_path, notify_script_path) -> dict[str, str]:
+    # Config reached the target without this run's cache vouching for it
+    # (hand edit, first run after an update): remember it so the next `on`
+    # skips reading the TOML entirely.
+    record_target_on(resolve_target_cache_path(snapshot_path), config_path, notify_script_path)
+    return already_on_result()
+
+
 def execute_on(document, config_path, snapshot_path, notify_script_path) -> dict[str, str]:
     # "on" flow:
     # 1) short-circuit if already in target state
@@ -114,11 +167,7 @@ def execute_on(document, config_path, snapshot_path, notify_script_path) -> dict
 
     # Fast path: no mutation/no writes when already at target state.
     if is_target_on(document, notify_script_path):
-        return build_result(
-            action=action,
-            status=STATUS_ALREADY_APPLIED,
-            rationale="Config already matches the v1 notifications-on target state.",
-        )
+        return recorded_already_on_result(config_path, snapshot_path, notify_script_path)
 
     prior_state = capture_prior_state(document)
     # Mutation happens in-memory first so we only touch disk once the new
@@ -126,10 +175,18 @@ def execute_on(document, config_path, snapshot_path, notify_script_path) -> dict
     apply_on_state(document, notify_script_path)
 
     try:
-        # Snapshot is written before config mutation so "off" has restore data.
-        write_snapshot(snapshot_path, config_path, prior_state)
-        # If this write succeeds, config and snapshot now represent one coherent state.
-        write_toml_document(config_path, document)
+        # Both files go through one batched write. Snapshot is replaced before
+        # config so "off" has restore data; once the batch succeeds, config and
+        # snapshot represent one coherent state.
+        # The snapshot is advisory: even with durable writes requested, only
+        # the config itself is fsync'd.
+        atomic_write_many(
+            [
+                (snapshot_path, dump_snapshot(config_path, prior_state)),
+                (config_path, dump_toml_document(document)),
+            ],
+            advisory=(snapshot_path,),
+        )
     except BaseException as exc:
         # If writes fail, remove the new snapshot so we do not advertise a restorable state.
         # Cleanup is best-effort because a secondary cleanup failure should not hide
@@ -145,6 +202,8 @@ def execute_on(document, config_path, snapshot_path, notify_script_path) -> dict
             failed_reason_prefix="Failed to apply notifications on",
         )
 
+    # Remember this config version is "on" so the next `on` can skip parsing.
+    record_target_on(resolve_target_cache_path(snapshot_path), config_path, notify_script_path)
     return build_result(
         action=action,
         status=STATUS_APPLIED,
@@ -157,12 +216,16 @@ def execute_off(
     config_path,
     snapshot_path,
     notify_script_path,
+    original_text: str | None = None,
 ) -> dict[str, str]:
     # "off" flow prefers exact restore from snapshot.
     # If snapshot is missing/broken, use a safe fallback that only removes
     # values this skill controls.
     action = "$notifications off"
 
+    # Any "off" run retires the "on" cache, so uninstall leaves no sidecar.
+    clear_target_cache(resolve_target_cache_path(snapshot_path))
+
     # load_snapshot returns either:
     # - prior_state dict (valid snapshot), or
     # - None with optional warning string (missing/broken snapshot)
@@ -177,7 +240,7 @@ def execute_off(
             # Skip write when restore produced no diff to preserve idempotency and
             # avoid unnecessary file churn.
             if changed:
-                write_toml_document(config_path, document)
+                write_toml_document(config_path, document, original_text)
             # Snapshot is single-use: remove after restore attempt.
             remove_snapshot(snapshot_path)
         except BaseException as exc:
@@ -201,17 +264,11 @@ def execute_off(
     changed = apply_safe_off_without_snapshot(document, notify_script_path)
     if not changed:
         # Already off (or nothing skill-managed to change).
-        return build_result(
-            action=action,
-            status=STATUS_ALREADY_APPLIED,
-            rationale="Notifications policy is already off and no snapshot restore was required"
-            + warning_suffix
-            + ".",
-        )
+        return already_off_result(warning_suffix)
 
     try:
         # Fallback path still persists through the same atomic write helper.
-        write_toml_document(config_path, document)
+        write_toml_document(config_path, document, original_text)
     except BaseException as exc:
         return result_from_exception(
             action=action,
@@ -229,6 +286,23 @@ def execute_off(
     )
 
 
+def readonly_noop_result(
+    command: str, raw: str, config_path, snapshot_path, notify_script_path
+) -> dict[str, str] | None:
+    # Both commands check for a no-op on a cheap read-only parse first and
+    # only build the editable tomlkit document when something must change.
+    # None means the full on/off flow is needed.
+    if command == "on":
+        if is_target_on_readonly(raw, notify_script_path):
+            return recorded_already_on_result(config_path, snapshot_path, notify_script_path)
+        return None
+
+    if is_off_readonly(raw, snapshot_path, notify_script_path):
+        clear_target_cache(resolve_target_cache_path(snapshot_path))
+        return already_off_result()
+    return None
+
+
 def execute_command(
     command: str,
     config_override: str | None,
@@ -236,8 +310,10 @@ def execute_command(
     notify_override: str | None,
 ) -> dict[str, str]:
     # Shared orchestration for both commands:
-    # validate input -> resolve paths -> verify writability -> load config
-    # -> delegate to on/off flow.
+    # validate input -> resolve paths -> load config -> delegate to on/off flow.
+    # Writability is not probed up front: the atomic write creates the config
+    # directory when needed and its OSError maps to "blocked" like any probe
+    # would, while no-op runs never need write access at all.
     action = f"$notifications {command}"
 
     # Guardrail: command must be exactly "on" or "off".
@@ -252,27 +328,31 @@ def execute_command(
     # If state helpers failed to import earlier, return a deterministic JSON
     # failure instead of raising during command handling.
     if _STATE_IMPORT_ERROR is not None:
-        return failed_result(
-            action,
-            "State module dependency initialization failed: "
-            + (
-                f"{_STATE_IMPORT_ERROR}. "
-                "Install runtime dependency with 'python3 -m pip install tomlkit'."
-            ),
-        )
+        return dependency_failed_result(action, _STATE_IMPORT_ERROR)
 
     config_path = resolve_config_path(config_override)
     snapshot_path = resolve_snapshot_path(config_path, snapshot_override)
     notify_script_path = resolve_notify_script_path(notify_override)
 
-    # Catch write-denied situations early to provide clear guidance.
-    writable, blocked_reason = prepare_config_directory(config_path)
-    if not writable:
-        return blocked_result(action, blocked_reason or "Config path is not writable.")
+    # Repeated `on` is the dominant invocation: if the cache vouches for this
+    # exact config file version, skip reading and parsing TOML entirely.
+    if command == "on" and is_cached_target_on(
+        resolve_target_cache_path(snapshot_path), config_path, notify_script_path
+    ):
+        return already_on_result()
 
     try:
+        raw = read_config_text(config_path)
+        noop_result = readonly_noop_result(
+            command, raw, config_path, snapshot_path, notify_script_path
+        )
+        if noop_result is not None:
+            return noop_result
         # Parse once, then pass the mutable document through on/off handlers.
-        document = load_toml_document(config_path)
+        document = parse_toml_document(raw)
+    except ImportError as exc:
+        # First point that needs tomlkit; no-op runs above never import it.
+        return dependency_failed_result(action, exc)
     except BaseException as exc:
         return result_from_exception(
             action=action,
@@ -283,21 +363,77 @@ def execute_command(
 
     if command == "on":
         return execute_on(document, config_path, snapshot_path, notify_script_path)
-    return execute_off(document, config_path, snapshot_path, notify_script_path)
+    return execute_off(document, config_path, snapshot_path, notify_script_path, raw)
 
 
-def parse_args(argv: list[str]) -> tuple[argparse.Namespace, list[str]]:
+class CliArgs(NamedTuple):
+    command: str | None
+    config: str | None
+    snapshot: str | None
+    notify_script: str | None
+    help: bool
+
+
+# Value-taking options mapped to their CliArgs field.
+_VALUE_OPTIONS = {
+    "--config": "config",
+    "--snapshot": "snapshot",
+    "--notify-script": "notify_script",
+}
+
+
+# Every long option, for argparse-style unambiguous prefixes (`--conf`).
+_LONG_OPTIONS = (*_VALUE_OPTIONS, "--help")
+
+
+def _expand_long_option(option: str) -> str:
+    # Exact names win; otherwise a prefix matching exactly one long option
+    # expands to it. Anything else is returned unchanged (and later
+    # reported as an unknown argument).
+    if option in _LONG_OPTIONS or not option.startswith("--") or len(option) < 3:
+        return option
+    matches = [name for name in _LONG_OPTIONS if name.startswith(option)]
+    return matches[0] if len(matches) == 1 else option
+
+
+def parse_args(argv: list[str]) -> tuple[CliArgs, list[str]]:
     # Keep parsing permissive so main() can return structured JSON errors
-    # instead of argparse's default raw stderr/exit behavior.
-    parser = argparse.ArgumentParser(add_help=False)
-    # Keep parser surface small and explicit: one positional command plus
-    # opt-in overrides for testing/manual execution.
-    parser.add_argument("command", nargs="?")
-    parser.add_argument("--config")
-    parser.add_argument("--snapshot")
-    parser.add_argument("--notify-script")
-    parser.add_argument("-h", "--help", action="store_true")
-    return parser.parse_known_args(argv)
+    # instead of a parser's raw stderr/exit behavior. The surface is one
+    # positional command plus opt-in overrides for testing/manual execution,
+    # so a direct scan replaces argparse and its import/setup cost.
+    values: dict[str, str | None] = dict.fromkeys(_VALUE_OPTIONS.values())
+    command: str | None = None
+    help_requested = False
+    extras: list[str] = []
+
+    tokens = iter(argv)
+    for token in tokens:
+        option, has_inline_value, inline_value = token.partition("=")
+        option = _expand_long_option(option)
+        if token == "-h" or (option == "--help" and not has_inline_value):
+            help_requested = True
+        elif option in _VALUE_OPTIONS:
+            # Accept both `--config PATH` and `--config=PATH`.
+            value = inline_value if has_inline_value else next(tokens, None)
+            if value is None:
+                raise ValueError(f"argument {option}: expected one argument")
+            values[_VALUE_OPTIONS[option]] = value
+        elif command is None and not token.startswith("-"):
+            command = token
+        else:
+            # Unknown flags and extra positionals are reported by main().
+            extras.append(token)
+
+    return (
+        CliArgs(
+            command=command,
+            config=values["config"],
+            snapshot=values["snapshot"],
+            notify_script=values["notify_script"],
+            help=help_requested,
+        ),
+        extras,
+    )
 
 
 def exit_code_for_status(status: str) -> int:
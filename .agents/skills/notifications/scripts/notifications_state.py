@@ -3,21 +3,30 @@
 
 from __future__ import annotations
 
-import copy
-import datetime as dt
 import errno
+import functools
 import json
 import os
 import shutil
 import sys
-import tempfile
+import time
 from pathlib import Path
-from typing import Any
+from typing import TYPE_CHECKING, Any
 
-import tomlkit
-from tomlkit.toml_document import TOMLDocument
+if TYPE_CHECKING:
+    from tomlkit.toml_document import TOMLDocument
+
+# tomlkit and the write-path-only module tempfile are imported inside the
+# functions that use them, so read-only, no-op and invalid-input invocations
+# do not pay their import cost. A missing tomlkit therefore surfaces as
+# ImportError from the editing helpers below.
 
 SNAPSHOT_FILENAME = ".codex-notifications-v1-snapshot.json"
+# Sidecar next to the snapshot remembering that a given config file version
+# already matches the "on" target, so repeated `on` runs can skip parsing.
+TARGET_CACHE_SUFFIX = ".parsecache.json"
+# Set to "1" to fsync every config/snapshot write before the atomic rename.
+FSYNC_ENV_VAR = "CODEX_NOTIFICATIONS_FSYNC"
 
 
 def _resolve_skill_python_command() -> str:
@@ -53,7 +62,19 @@ def _resolve_skill_python_command() -> str:
 # Canonical values this skill writes when notifications are enabled.
 SKILL_NOTIFY_COMMAND = _resolve_skill_python_command()
 TARGET_TUI_NOTIFICATIONS = ("approval-requested",)
+# List form for comparisons against parsed config (TOML arrays load as lists),
+# built once instead of per check. Never mutated: assigning it into a tomlkit
+# table copies it.
+_TARGET_TUI_NOTIFICATIONS_LIST = list(TARGET_TUI_NOTIFICATIONS)
 TARGET_TUI_NOTIFICATION_METHOD = "bel"
+# The skill's [tui] override as one (notification_method, notifications)
+# pair; the method string comes first so a mismatch fails on the cheaper
+# compare.
+_TARGET_TUI_PAIR = (TARGET_TUI_NOTIFICATION_METHOD, _TARGET_TUI_NOTIFICATIONS_LIST)
+
+
+# errno values that mean "not allowed here" rather than "something broke".
+_BLOCK_ERRNOS = frozenset({errno.EACCES, errno.EPERM, errno.EROFS})
 
 
 def is_permission_block(exc: BaseException) -> bool:
@@ -62,7 +83,7 @@ def is_permission_block(exc: BaseException) -> bool:
     if isinstance(exc, PermissionError):
         return True
     if isinstance(exc, OSError):
-        return exc.errno in {errno.EACCES, errno.EPERM, errno.EROFS}
+        return exc.errno in _BLOCK_ERRNOS
     return False
 
 
@@ -86,60 +107,31 @@ def resolve_snapshot_path(config_path: Path, snapshot_override: str | None) -> P
     return config_path.parent / SNAPSHOT_FILENAME
 
 
+@functools.lru_cache(maxsize=8)
 def resolve_notify_script_path(notify_override: str | None) -> Path:
     # Resolve to an absolute script path so notify matching is deterministic.
+    # Cached: resolve() walks every path component with lstat/readlink.
     if notify_override:
         return Path(notify_override).expanduser().resolve()
     return Path(__file__).resolve().with_name("notify_event.py")
 
 
-def prepare_config_directory(config_path: Path) -> tuple[bool, str | None]:
-    # Ensure parent directory exists and is writable before any read/write
-    # to avoid partial work and confusing mid-flight failures.
-    parent = config_path.parent
+def read_config_text(path: Path) -> str:
+    # Missing config reads as empty text so "on" can initialize settings
+    # without special caller logic. The open itself detects a missing file,
+    # so no separate exists() stat is needed.
     try:
-        parent.mkdir(parents=True, exist_ok=True)
-    except OSError as exc:
-        return (
-            False,
-            f"Cannot create config directory '{parent}': {exc}",
-        )
+        return path.read_text(encoding="utf-8")
+    except FileNotFoundError:
+        return ""
 
-    probe_path: Path | None = None
-    try:
-        # Probe writes fail fast when sandbox rules or permissions block mutations.
-        fd, raw_path = tempfile.mkstemp(
-            prefix=".codexnotifications-write-probe-",
-            dir=parent,
-        )
-        os.close(fd)
-        probe_path = Path(raw_path)
-    except OSError as exc:
-        return (
-            False,
-            f"Config directory '{parent}' is not writable: {exc}",
-        )
-    finally:
-        if probe_path is not None:
-            try:
-                probe_path.unlink(missing_ok=True)
-            except OSError:
-                pass
-
-    return True, None
 
+def parse_toml_document(raw: str) -> TOMLDocument:
+    # Blank config is treated as an empty document; anything else is parsed
+    # into an editable, comment-preserving tomlkit document.
+    import tomlkit
+    from tomlkit.toml_document import TOMLDocument
 
-def load_toml_document(path: Path) -> TOMLDocument:
-    # Missing or empty config is treated as an empty document so "on" can
-    # initialize settings without special caller logic.
-    # Step-by-step:
-    # 1) if file absent -> return empty TOML document
-    # 2) if file blank -> return empty TOML document
-    # 3) else parse and assert table root
-    if not path.exists():
-        return tomlkit.document()
-
-    raw = path.read_text(encoding="utf-8")
     if not raw.strip():
         return tomlkit.document()
 
@@ -149,61 +141,226 @@ def load_toml_document(path: Path) -> TOMLDocument:
     return parsed
 
 
-def atomic_write_text(path: Path, content: str) -> None:
-    # Atomic write pattern:
-    # 1) write to temp file in same directory
-    # 2) fsync
-    # 3) replace destination
-    # This protects config files from partial writes.
-    path.parent.mkdir(parents=True, exist_ok=True)
-    fd, temp_raw = tempfile.mkstemp(prefix=f".{path.name}.tmp-", dir=path.parent)
-    temp_path = Path(temp_raw)
+def _load_tomllib() -> Any | None:
+    # `tomllib` is stdlib from Python 3.11 on; load lazily so 3.10 simply
+    # skips the read-only fast path.
     try:
-        # Write the new file content to temp path, not directly to destination.
-        with os.fdopen(fd, "w", encoding="utf-8", newline="\n") as handle:
-            handle.write(content)
-            handle.flush()
-            # fsync + replace avoids half-written files if the process exits mid-write.
-            os.fsync(handle.fileno())
-
-        if path.exists():
-            try:
-                # Preserve existing file mode when replacing an existing target.
-                os.chmod(temp_path, path.stat().st_mode & 0o777)
-            except OSError:
-                pass
+        import importlib
+
+        return importlib.import_module("tomllib")
+    except ImportError:
+        return None
+
+
+def _parse_toml_readonly(raw: str) -> dict[str, Any] | None:
+    # Plain-dict parse for read-only checks. tomllib builds plain dicts
+    # several times faster than tomlkit builds its editable document.
+    # None (tomllib unavailable or a parse error) sends callers to the tomlkit
+    # path, which reports parse errors with its usual wording.
+    tomllib = _load_tomllib()
+    if tomllib is None:
+        return None
+    try:
+        parsed: dict[str, Any] = tomllib.loads(raw)
+    except ValueError:
+        return None
+    return parsed
+
+
+def is_target_on_readonly(raw: str, notify_script_path: Path) -> bool:
+    # Read-only "already on" check; the dominant repeated `on` never needs
+    # to edit anything.
+    parsed = _parse_toml_readonly(raw)
+    return parsed is not None and is_target_on(parsed, notify_script_path)
+
+
+def is_off_readonly(raw: str, snapshot_path: Path, notify_script_path: Path) -> bool:
+    # Read-only "already off" check. Without a snapshot, "off" is the safe-off
+    # fallback, which only touches a skill `notify` value or the skill's
+    # approval-requested override:
+    # 1) blank config -> nothing to do, no parse at all
+    # 2) else run safe-off on a throwaway plain dict and see whether it would
+    #    change anything
+    # Unparseable TOML is never vouched for, so it still reaches the tomlkit
+    # path and reports "Failed to parse config TOML".
+    if snapshot_path.exists():
+        return False
+    if not raw.strip():
+        return True
+    parsed = _parse_toml_readonly(raw)
+    return parsed is not None and not apply_safe_off_without_snapshot(parsed, notify_script_path)
+
+
+def fsync_requested() -> bool:
+    # Durable (fsync'd) writes are opt-in: the rename alone already keeps
+    # readers from ever seeing a half-written file, and fsync dominates the
+    # runtime of this CLI on slow disks.
+    return os.environ.get(FSYNC_ENV_VAR) == "1"
 
-        # Atomic rename: temp path becomes the final destination path.
-        # After this call succeeds, temp filename no longer exists.
-        os.replace(temp_path, path)
+
+def _fsync_directory(directory: Path) -> None:
+    # Persist rename entries themselves. Directories cannot be opened for
+    # fsync on Windows, where NTFS journals renames on its own.
+    if not hasattr(os, "O_DIRECTORY"):
+        return
+    dir_fd = os.open(directory, os.O_RDONLY | os.O_DIRECTORY)
+    try:
+        os.fsync(dir_fd)
     finally:
-        # If replacement did not happen (or failed), clean up temp artifact.
+        os.close(dir_fd)
+
+
+def _write_all(fd: int, data: bytes) -> None:
+    # Unbuffered write straight to the descriptor; os.write may write short.
+    view = memoryview(data)
+    while view:
+        view = view[os.write(fd, view) :]
+
+
+def _write_temp_files(
+    writes: list[tuple[Path, str]], staged: list[tuple[Path, Path]], durable: set[Path]
+) -> None:
+    # Write every payload to a temp file in its destination directory and
+    # record (destination, temp) pairs in `staged` as soon as each exists, so
+    # the caller can clean up after a partial failure. Payloads are a few
+    # hundred bytes, so they are encoded once and written with os.write
+    # instead of through a text-mode file object.
+    import tempfile
+
+    for path, content in writes:
+        prefix = f".{path.name}.tmp-"
+        try:
+            fd, temp_raw = tempfile.mkstemp(prefix=prefix, dir=path.parent)
+        except FileNotFoundError:
+            # Only create the directory when it is actually missing,
+            # instead of paying a mkdir on every write.
+            path.parent.mkdir(parents=True, exist_ok=True)
+            fd, temp_raw = tempfile.mkstemp(prefix=prefix, dir=path.parent)
+        staged.append((path, Path(temp_raw)))
+        try:
+            _write_all(fd, content.encode("utf-8"))
+            if path in durable:
+                # fsync before replace also survives power loss, not just
+                # process exit.
+                os.fsync(fd)
+        finally:
+            os.close(fd)
+
+
+def _replace_preserving_mode(temp_path: Path, path: Path) -> None:
+    # One stat serves as both the existence check and the mode lookup.
+    try:
+        mode = os.stat(path).st_mode & 0o777
+    except OSError:
+        # New target (or unreadable metadata): keep mkstemp's private mode.
+        mode = None
+    if mode is not None:
+        try:
+            # Preserve existing file mode when replacing an existing target.
+            os.chmod(temp_path, mode)
+        except OSError:
+            pass
+
+    # Atomic rename: temp path becomes the final destination path.
+    # After this call succeeds, temp filename no longer exists.
+    os.replace(temp_path, path)
+
+
+def atomic_write_many(
+    writes: list[tuple[Path, str]], *, fsync: bool = False, advisory: tuple[Path, ...] = ()
+) -> None:
+    # Atomic write pattern, batched for files that change together:
+    # 1) write every payload to a temp file in its destination directory,
+    #    fsyncing it when durability is requested by caller or FSYNC_ENV_VAR
+    #    (except `advisory` files, which are cheap to lose on power loss)
+    # 2) replace destinations in the given order
+    # 3) fsync each durable file's parent directory once so the renames are
+    #    durable too
+    # Callers order `writes` so a crash between renames leaves a recoverable
+    # state (snapshot before config).
+    durable: set[Path] = set()
+    if fsync or fsync_requested():
+        durable = {path for path, _ in writes if path not in advisory}
+    staged: list[tuple[Path, Path]] = []
+    try:
+        _write_temp_files(writes, staged, durable)
+        for path, temp_path in staged:
+            _replace_preserving_mode(temp_path, path)
+
+        for parent in dict.fromkeys(path.parent for path in durable):
+            _fsync_directory(parent)
+    finally:
+        # If replacement did not happen (or failed), clean up temp artifacts.
+        # After a successful replace the temp name is already gone, so a bare
+        # unlink that expects ENOENT costs one syscall instead of stat+unlink.
         # This is best-effort; hard crashes can still leave temp files behind.
-        if temp_path.exists():
+        for _, temp_path in staged:
             try:
-                temp_path.unlink()
+                os.unlink(temp_path)
             except OSError:
                 pass
 
 
-def write_toml_document(path: Path, document: TOMLDocument) -> None:
+def atomic_write_text(path: Path, content: str, *, fsync: bool = False) -> None:
+    # Single-file form of atomic_write_many.
+    atomic_write_many([(path, content)], fsync=fsync)
+
+
+def write_toml_document(
+    path: Path, document: TOMLDocument, original_text: str | None = None
+) -> bool:
     # Dedicated helper keeps TOML serialization and write semantics centralized.
-    content = tomlkit.dumps(document)
+    # tomlkit is kept on purpose instead of a faster plain-dict emitter (e.g.
+    # tomli_w): it round-trips user comments and formatting untouched.
+    # When the caller passes the text the document was parsed from, an edit
+    # that serializes back to the same text skips the write entirely.
+    # Returns whether the file was written.
+    content = dump_toml_document(document)
+    if content == original_text:
+        return False
     atomic_write_text(path, content)
+    return True
+
+
+def dump_toml_document(document: TOMLDocument) -> str:
+    # Serialized form shared by single writes and batched writes.
+    import tomlkit
+
+    return tomlkit.dumps(document)
+
+
+# Exact (not isinstance) types: tomlkit items subclass str/int/bool and still
+# need unwrapping, while plain immutable leaves can be returned as-is.
+_PLAIN_SCALAR_TYPES = frozenset({str, int, float, bool, type(None)})
 
 
 def _unwrap_value(value: Any) -> Any:
-    # Convert tomlkit container/item types into plain Python values so
-    # equality checks and JSON snapshots are stable and predictable.
+    # Convert tomlkit container/item types into plain Python values so JSON
+    # snapshots are stable. key_state only ever passes tomlkit items, whose
+    # deep unwrap() builds fresh containers that never alias the document.
+    if type(value) in _PLAIN_SCALAR_TYPES:
+        return value
     if hasattr(value, "unwrap"):
-        value = value.unwrap()
+        return value.unwrap()
+    return value
+
 
-    if isinstance(value, dict):
-        return {str(key): _unwrap_value(item) for key, item in value.items()}
+# Exact types whose instances are already plain for comparison purposes.
+# tomllib and snapshot JSON only ever produce these (and plain containers of
+# them); tomlkit items are subclasses, so they miss this set.
+_PLAIN_COMPARED_TYPES = _PLAIN_SCALAR_TYPES | {list, dict}
 
-    if isinstance(value, list):
-        return [_unwrap_value(item) for item in value]
 
+def _compared_value(value: Any) -> Any:
+    # Plain-value view for equality checks only. Plain values (tomllib dicts,
+    # snapshot JSON) are returned by identity without an attribute probe, and
+    # tomlkit's unwrap() already converts nested items, so no fresh
+    # containers are built. Use _unwrap_value where the result is stored and
+    # must not alias the source.
+    if type(value) in _PLAIN_COMPARED_TYPES:
+        return value
+    if hasattr(value, "unwrap"):
+        return value.unwrap()
     return value
 
 
@@ -211,8 +368,9 @@ def key_state(value_present: bool, value: Any | None = None) -> dict[str, Any]:
     # Snapshot format stores both key presence and value to distinguish
     # "key absent" from "key present with false/empty value".
     if value_present:
-        # Deep-copy avoids accidental mutation after snapshot capture.
-        return {"present": True, "value": copy.deepcopy(_unwrap_value(value))}
+        # tomlkit's unwrap() builds fresh containers, so the snapshot never
+        # aliases the live document.
+        return {"present": True, "value": _unwrap_value(value)}
     return {"present": False}
 
 
@@ -237,9 +395,7 @@ def capture_prior_state(document: TOMLDocument) -> dict[str, Any]:
     return prior
 
 
-def write_snapshot(
-    snapshot_path: Path, config_path: Path, prior_state: dict[str, Any]
-) -> None:
+def dump_snapshot(config_path: Path, prior_state: dict[str, Any]) -> str:
     # Snapshot is JSON for easy debugging and compatibility with tooling.
     # Stored fields:
     # - version: schema marker
@@ -248,11 +404,16 @@ def write_snapshot(
     # - prior: captured values for restore
     payload = {
         "version": 1,
-        "created_at": dt.datetime.now(dt.timezone.utc).isoformat(),
+        # Second precision from one libc call; nothing parses this field.
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
         "config_path": str(config_path),
         "prior": prior_state,
     }
-    atomic_write_text(snapshot_path, json.dumps(payload, indent=2, ensure_ascii=True) + "\n")
+    # Compact separators keep json on its C encoder; indent= forces the
+    # pure-Python encoder. load_snapshot reads either layout.
+    # Non-ASCII text is kept as-is rather than \u-escaped: the file is always
+    # written as UTF-8 and json.loads detects UTF-8 bytes on the way back.
+    return json.dumps(payload, separators=(",", ":"), ensure_ascii=False) + "\n"
 
 
 def load_snapshot(snapshot_path: Path) -> tuple[dict[str, Any] | None, str | None]:
@@ -260,19 +421,21 @@ def load_snapshot(snapshot_path: Path) -> tuple[dict[str, Any] | None, str | Non
     # - (prior_state, None) when valid
     # - (None, warning_message) when malformed/unreadable
     # This lets callers continue with safe fallback while surfacing context.
-    if not snapshot_path.exists():
-        return None, None
-
     try:
-        # Read raw snapshot text first so parse and schema errors can be
-        # reported separately.
-        raw = snapshot_path.read_text(encoding="utf-8")
+        # Read raw snapshot bytes first so parse and schema errors can be
+        # reported separately. A missing snapshot is detected by the open
+        # itself rather than a separate exists() stat.
+        raw = snapshot_path.read_bytes()
+    except FileNotFoundError:
+        return None, None
     except OSError as exc:
         return None, f"Snapshot read failed: {exc}"
 
     try:
+        # json.loads decodes bytes itself; ValueError covers both
+        # JSONDecodeError and a snapshot that is not valid UTF-8.
         payload = json.loads(raw)
-    except json.JSONDecodeError as exc:
+    except ValueError as exc:
         return None, f"Snapshot format invalid: {exc}"
 
     if not isinstance(payload, dict):
@@ -292,9 +455,75 @@ def remove_snapshot(snapshot_path: Path) -> None:
     snapshot_path.unlink(missing_ok=True)
 
 
+def resolve_target_cache_path(snapshot_path: Path) -> Path:
+    # Cache lives next to the snapshot, so overrides move both together.
+    return snapshot_path.with_suffix(TARGET_CACHE_SUFFIX)
+
+
+def _config_fingerprint(config_path: Path) -> list[int] | None:
+    # Inode + mtime + size identify one version of the config file: atomic
+    # rewrites (ours and most editors') change the inode, in-place edits
+    # change mtime_ns.
+    try:
+        stat = os.stat(config_path)
+    except OSError:
+        return None
+    return [stat.st_ino, stat.st_mtime_ns, stat.st_size]
+
+
+def _target_cache_key(config_path: Path, notify_script_path: Path) -> dict[str, Any]:
+    # The full target is part of the key so a different --notify-script or a
+    # changed target definition never reuses a stale entry.
+    return {
+        "version": 1,
+        "config": _config_fingerprint(config_path),
+        "target": [
+            notify_target_value(notify_script_path),
+            _TARGET_TUI_NOTIFICATIONS_LIST,
+            TARGET_TUI_NOTIFICATION_METHOD,
+        ],
+    }
+
+
+def is_cached_target_on(cache_path: Path, config_path: Path, notify_script_path: Path) -> bool:
+    # True only when the cache vouches for this exact config file version.
+    # Any read/format problem is a cache miss, never an error.
+    key = _target_cache_key(config_path, notify_script_path)
+    if key["config"] is None:
+        return False
+    try:
+        payload = json.loads(cache_path.read_bytes())
+    except (OSError, ValueError):
+        return False
+    return payload == key
+
+
+def record_target_on(cache_path: Path, config_path: Path, notify_script_path: Path) -> None:
+    # Best-effort: a missing cache only costs one TOML parse next time.
+    key = _target_cache_key(config_path, notify_script_path)
+    if key["config"] is None:
+        return
+    try:
+        atomic_write_text(cache_path, json.dumps(key, ensure_ascii=True) + "\n")
+    except OSError:
+        pass
+
+
+def clear_target_cache(cache_path: Path) -> None:
+    # Best-effort invalidation; a stale entry is also rejected by fingerprint.
+    try:
+        cache_path.unlink(missing_ok=True)
+    except OSError:
+        pass
+
+
+@functools.lru_cache(maxsize=64)
 def normalized_path(path_value: str) -> str:
     # Normalize for reliable path comparisons across relative/tilde input.
-    return str(Path(path_value).expanduser().resolve())
+    # Cached because the same notify path is compared several times per run.
+    # os.path works on the string directly; Path.resolve() does the same
+    # realpath walk but builds Path objects only to stringify them.
+    return os.path.realpath(os.path.expanduser(path_value))
 
 
 def notify_target_value(notify_script_path: Path) -> list[str]:
@@ -304,7 +533,7 @@ def notify_target_value(notify_script_path: Path) -> list[str]:
 
 def is_skill_notify_value(value: Any, notify_script_path: Path) -> bool:
     # True only when notify points to this skill's exact hook command/path.
-    unwrapped = _unwrap_value(value)
+    unwrapped = _compared_value(value)
     if not isinstance(unwrapped, list) or len(unwrapped) != 2:
         return False
 
@@ -319,19 +548,24 @@ def is_skill_notify_value(value: Any, notify_script_path: Path) -> bool:
         return False
 
 
-def is_target_on(document: TOMLDocument, notify_script_path: Path) -> bool:
+def _tui_pair(tui: dict[str, Any]) -> tuple[Any, Any]:
+    # Current [tui] values in _TARGET_TUI_PAIR order.
+    return (
+        _compared_value(tui.get("notification_method")),
+        _compared_value(tui.get("notifications")),
+    )
+
+
+def is_target_on(document: dict[str, Any], notify_script_path: Path) -> bool:
     # Detect full "on" state across all controlled keys.
     # All managed keys must match, not just one key.
-    notify_ok = is_skill_notify_value(document.get("notify"), notify_script_path)
     tui = document.get("tui")
     if not isinstance(tui, dict):
         return False
 
-    return (
-        notify_ok
-        and _unwrap_value(tui.get("notifications")) == list(TARGET_TUI_NOTIFICATIONS)
-        and _unwrap_value(tui.get("notification_method"))
-        == TARGET_TUI_NOTIFICATION_METHOD
+    # Cheapest comparisons first: the notify check resolves a path on disk.
+    return _tui_pair(tui) == _TARGET_TUI_PAIR and is_skill_notify_value(
+        document.get("notify"), notify_script_path
     )
 
 
@@ -341,7 +575,7 @@ def apply_on_state(document: TOMLDocument, notify_script_path: Path) -> bool:
     changed = False
 
     target_notify = notify_target_value(notify_script_path)
-    if _unwrap_value(document.get("notify")) != target_notify:
+    if _compared_value(document.get("notify")) != target_notify:
         # Update notify command to point to this skill's hook script.
         document["notify"] = target_notify
         changed = True
@@ -349,17 +583,18 @@ def apply_on_state(document: TOMLDocument, notify_script_path: Path) -> bool:
     tui = document.get("tui")
     if not isinstance(tui, dict):
         # Create [tui] section only when needed.
+        import tomlkit
+
         tui = tomlkit.table()
         document["tui"] = tui
         changed = True
 
-    target_notifications = list(TARGET_TUI_NOTIFICATIONS)
-    if _unwrap_value(tui.get("notifications")) != target_notifications:
+    if _compared_value(tui.get("notifications")) != _TARGET_TUI_NOTIFICATIONS_LIST:
         # Enable approval-requested notifications in TUI policy.
-        tui["notifications"] = target_notifications
+        tui["notifications"] = _TARGET_TUI_NOTIFICATIONS_LIST
         changed = True
 
-    if _unwrap_value(tui.get("notification_method")) != TARGET_TUI_NOTIFICATION_METHOD:
+    if _compared_value(tui.get("notification_method")) != TARGET_TUI_NOTIFICATION_METHOD:
         # Choose terminal bell as configured notification method.
         tui["notification_method"] = TARGET_TUI_NOTIFICATION_METHOD
         changed = True
@@ -367,56 +602,77 @@ def apply_on_state(document: TOMLDocument, notify_script_path: Path) -> bool:
     return changed
 
 
-def restore_key(document: TOMLDocument, key: str, state: dict[str, Any] | None) -> None:
-    # Restore top-level key to previous value or remove if previously absent.
+def _restore_entry(table: dict[str, Any], key: str, state: dict[str, Any] | None) -> bool:
+    # Restore one key in `table` and report whether anything changed.
     if state and state.get("present"):
-        # Recreate prior value exactly when key existed before.
-        document[key] = copy.deepcopy(state.get("value"))
-    else:
-        # Remove key when prior state says it was absent.
-        document.pop(key, None)
+        value = state.get("value")
+        if key in table:
+            current = _compared_value(table[key])
+            # Type check keeps e.g. `true` and `1` distinct.
+            if type(current) is type(value) and current == value:
+                return False
+        # Assign directly: tomlkit converts plain values into fresh items on
+        # assignment, so the document never aliases snapshot data.
+        table[key] = value
+        return True
+
+    if key not in table:
+        return False
+    del table[key]
+    return True
+
+
+def restore_key(document: TOMLDocument, key: str, state: dict[str, Any] | None) -> bool:
+    # Restore top-level key to previous value or remove if previously absent.
+    # Returns True when the document changed.
+    return _restore_entry(document, key, state)
 
 
 def restore_tui_key(
     document: TOMLDocument, key: str, state: dict[str, Any] | None
-) -> None:
+) -> bool:
     # Same restore semantics as restore_key, but scoped to [tui] table.
     tui = document.get("tui")
     if state and state.get("present"):
+        created = False
         if not isinstance(tui, dict):
             # Recreate [tui] if prior state says key existed.
+            import tomlkit
+
             tui = tomlkit.table()
             document["tui"] = tui
-        tui[key] = copy.deepcopy(state.get("value"))
-        return
+            created = True
+        return _restore_entry(tui, key, state) or created
 
-    if isinstance(tui, dict):
-        tui.pop(key, None)
-        if not tui:
-            # Remove empty [tui] table to keep config tidy.
-            document.pop("tui", None)
+    if not isinstance(tui, dict):
+        return False
+
+    changed = _restore_entry(tui, key, state)
+    if not tui:
+        # Remove empty [tui] table to keep config tidy.
+        document.pop("tui", None)
+        changed = True
+    return changed
 
 
 def apply_snapshot_restore(document: TOMLDocument, prior_state: dict[str, Any]) -> bool:
-    # Serialize before/after so callers can keep a strict idempotency contract.
-    # We compare full document text because multiple nested key operations happen
-    # and a single boolean from each helper is harder to compose safely.
-    before = tomlkit.dumps(document)
-
-    restore_key(document, "notify", prior_state.get("notify"))
-    restore_tui_key(document, "notifications", prior_state.get("tui.notifications"))
-    restore_tui_key(
+    # Each helper reports whether it mutated the document, so no full-document
+    # serialization is needed to keep the idempotency contract. `|=` (not
+    # `or`) makes sure every key is restored.
+    changed = restore_key(document, "notify", prior_state.get("notify"))
+    changed |= restore_tui_key(
+        document, "notifications", prior_state.get("tui.notifications")
+    )
+    changed |= restore_tui_key(
         document,
         "notification_method",
         prior_state.get("tui.notification_method"),
     )
-
-    after = tomlkit.dumps(document)
-    return before != after
+    return changed
 
 
 def apply_safe_off_without_snapshot(
-    document: TOMLDocument, notify_script_path: Path
+    document: dict[str, Any], notify_script_path: Path
 ) -> bool:
     # Fallback path when no valid snapshot exists.
     # Goal: undo only this skill's known overrides and avoid touching
@@ -432,12 +688,9 @@ def apply_safe_off_without_snapshot(
 
     tui = document.get("tui")
     if isinstance(tui, dict):
-        notifications = _unwrap_value(tui.get("notifications"))
-        notification_method = _unwrap_value(tui.get("notification_method"))
-        skill_approval_override = (
-            notifications == list(TARGET_TUI_NOTIFICATIONS)
-            and notification_method == TARGET_TUI_NOTIFICATION_METHOD
-        )
+        current_pair = _tui_pair(tui)
+        notifications = current_pair[1]
+        skill_approval_override = current_pair == _TARGET_TUI_PAIR
         # Without a snapshot, only disable the exact skill override and leave custom values alone.
         # We also skip writing if notifications is already False to preserve idempotency.
         if (skill_notify or skill_approval_override) and notifications is not False:
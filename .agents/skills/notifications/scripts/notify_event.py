@@ -3,16 +3,22 @@
 
 from __future__ import annotations
 
-import datetime as dt
+import atexit
+import functools
 import json
 import os
-import platform
-import subprocess
+import signal
 import sys
+import time
+from collections.abc import Callable, Iterator, Sequence
 from pathlib import Path
 from typing import Any
 
 SUPPORTED_EVENT = "agent-turn-complete"
+# Known event names hit a set lookup; other `*-turn-complete` variants
+# fall back to the suffix check.
+_SUPPORTED_EVENTS = frozenset({SUPPORTED_EVENT})
+_SUPPORTED_EVENT_SUFFIX = "-turn-complete"
 WINDOWS_MEDIA_FILENAMES = (
     "chimes.wav",
     "Windows Notify.wav",
@@ -25,6 +31,45 @@ WINDOWS_BEEP_PATTERN = (
     (1047, 160),
 )
 _LAST_BACKEND = "none"
+# OS name never changes within a process; derive it once from
+# `sys.platform` (no `platform` import or uname call needed).
+_SYSTEM = {"darwin": "darwin", "win32": "windows"}.get(sys.platform, sys.platform)
+# Seconds a backend command may run before it counts as failed.
+RUN_COMMAND_TIMEOUT = 2
+# run_command_status() results.
+COMMAND_OK = "ok"
+COMMAND_FAILED = "failed"
+COMMAND_MISSING = "missing"
+# Backend labels ending in this suffix mean "not installed here", as opposed
+# to "installed but failed this time".
+UNAVAILABLE_SUFFIX = "-unavailable"
+# Seconds a cached list of unavailable backends stays trusted.
+UNAVAILABLE_BACKEND_TTL = 24 * 60 * 60
+_HAS_POSIX_SPAWN = hasattr(os, "posix_spawnp")
+_DEVNULL_FILE_ACTIONS = (
+    [
+        (os.POSIX_SPAWN_OPEN, 1, os.devnull, os.O_WRONLY, 0),
+        (os.POSIX_SPAWN_OPEN, 2, os.devnull, os.O_WRONLY, 0),
+    ]
+    if _HAS_POSIX_SPAWN
+    else []
+)
+# Python ignores these at startup; reset them to default in spawned children
+# like subprocess's restore_signals does.
+_SPAWN_SIGDEF = tuple(
+    getattr(signal, name) for name in ("SIGPIPE", "SIGXFSZ") if hasattr(signal, name)
+)
+# Per-OS backend commands as (argv, backend label), tried in order.
+_DARWIN_COMMANDS = (
+    (("afplay", "/System/Library/Sounds/Glass.aiff"), "darwin:afplay"),
+    (("osascript", "-e", "beep"), "darwin:osascript-beep"),
+)
+_UNIX_COMMANDS = (
+    (("paplay", "/usr/share/sounds/freedesktop/stereo/complete.oga"), "linux:paplay"),
+    (("canberra-gtk-play", "-i", "complete", "-d", "codex"), "linux:canberra-gtk-play"),
+)
+# Debug events waiting for `flush_debug_events()`.
+_PENDING_DEBUG_EVENTS: list[tuple[int, str, dict[str, object]]] = []
 
 
 def set_last_backend(backend: str) -> None:
@@ -48,19 +93,19 @@ def _debug_log_path() -> Path:
     return Path.home() / ".codex" / "log" / "notify_hook.log"
 
 
-def _debug_log_targets() -> list[Path]:
+def _debug_log_targets() -> Iterator[Path]:
     # Primary target is configurable/default path.
-    # Fallback target is local cwd file when primary path is not writable.
+    # Fallback target is local cwd file when primary path is not writable;
+    # it is only computed if the primary write actually fails.
     primary = _debug_log_path()
+    yield primary
     try:
         fallback = Path.cwd() / "notify_hook.log"
     except OSError:
         # If cwd is unavailable, keep only the primary target.
-        return [primary]
-
-    if fallback == primary:
-        return [primary]
-    return [primary, fallback]
+        return
+    if fallback != primary:
+        yield fallback
 
 
 def log_debug_event(event: str, **fields: object) -> None:
@@ -68,27 +113,54 @@ def log_debug_event(event: str, **fields: object) -> None:
     # - never raises
     # - never writes to stdout
     # - includes timestamp and process id for correlation
-    payload: dict[str, object] = {
-        "ts": dt.datetime.now(dt.timezone.utc).isoformat(),
-        "event": event,
-        "pid": os.getpid(),
-    }
-    payload.update(fields)
-    line = json.dumps(payload, ensure_ascii=True)
+    # Events are buffered and written together by `flush_debug_events()`,
+    # so one invocation costs one open/write instead of one per event.
+    # Only the raw epoch nanoseconds are taken here; formatting happens at flush.
+    _PENDING_DEBUG_EVENTS.append((time.time_ns(), event, fields))
+
+
+def _format_timestamp(ns: int) -> str:
+    # UTC ISO-8601 with microseconds, same shape as datetime.isoformat().
+    seconds, remainder = divmod(ns, 1_000_000_000)
+    stamp = time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(seconds))
+    return f"{stamp}.{remainder // 1000:06d}+00:00"
+
+
+def flush_debug_events() -> None:
+    # Write all buffered events in one append; safe to call repeatedly.
+    if not _PENDING_DEBUG_EVENTS:
+        return
+    pid = os.getpid()
+    lines: list[str] = []
+    for ns, event, fields in _PENDING_DEBUG_EVENTS:
+        payload: dict[str, object] = {"ts": _format_timestamp(ns), "event": event, "pid": pid}
+        payload.update(fields)
+        lines.append(json.dumps(payload, ensure_ascii=True, separators=(",", ":")) + "\n")
+    data = "".join(lines)
+    _PENDING_DEBUG_EVENTS.clear()
 
     try:
-        targets = _debug_log_targets()
+        for target in _debug_log_targets():
+            if _append_log_text(target, data):
+                return
     except OSError:
         return
 
-    for target in targets:
+
+def _append_log_text(target: Path, data: str) -> bool:
+    # Open first and create the directory only when it is missing, so the
+    # common case costs no mkdir call.
+    try:
         try:
+            handle = target.open("a", encoding="utf-8", newline="\n")
+        except FileNotFoundError:
             target.parent.mkdir(parents=True, exist_ok=True)
-            with target.open("a", encoding="utf-8", newline="\n") as handle:
-                handle.write(line + "\n")
-            return
-        except OSError:
-            continue
+            handle = target.open("a", encoding="utf-8", newline="\n")
+        with handle:
+            handle.write(data)
+    except OSError:
+        return False
+    return True
 
 
 def log_error(message: str) -> None:
@@ -96,49 +168,122 @@ def log_error(message: str) -> None:
     print(f"notify_event: {message}", file=sys.stderr)
 
 
-def run_command(command: list[str]) -> bool:
+def run_command(command: Sequence[str]) -> bool:
     # Run a backend command quietly and treat non-zero/exception as failure.
+    return run_command_status(command) == COMMAND_OK
+
+
+def run_command_status(command: Sequence[str]) -> str:
+    # Like run_command, but tells a missing binary (COMMAND_MISSING) apart
+    # from one that ran and failed (COMMAND_FAILED).
     # Timeouts keep notification hooks from stalling the main CLI flow.
+    # POSIX uses a bare posix_spawnp + waitpid; elsewhere use subprocess.
+    if _HAS_POSIX_SPAWN:
+        return _spawn_command(command)
+    return _subprocess_command(command)
+
+
+def _spawn_command(command: Sequence[str]) -> str:
+    # Child output goes to /dev/null via spawn file actions, so the parent
+    # never opens it. Poll for exit until the timeout, then kill and reap.
+    try:
+        pid = os.posix_spawnp(
+            command[0],
+            list(command),
+            os.environ,
+            file_actions=_DEVNULL_FILE_ACTIONS,
+            setsigdef=_SPAWN_SIGDEF,
+        )
+    except OSError:
+        # Command/binary missing or not executable.
+        return COMMAND_MISSING
+
+    # Exponential backoff (0.5 ms doubling up to 50 ms), as subprocess's own
+    # timed wait does, so a 2 s timeout costs ~50 wakeups rather than hundreds.
+    deadline = time.monotonic() + RUN_COMMAND_TIMEOUT
+    delay = 0.0005
+    while True:
+        waited_pid, exit_code = _reap_child(pid, os.WNOHANG)
+        if waited_pid:
+            # Only explicit exit code 0 counts as success.
+            return COMMAND_OK if exit_code == 0 else COMMAND_FAILED
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            break
+        delay = min(delay * 2, remaining, 0.05)
+        time.sleep(delay)
+
+    # Timed out: kill and reap, then report failure like subprocess.run's
+    # TimeoutExpired.
+    try:
+        os.kill(pid, signal.SIGKILL)
+    except OSError:
+        pass
+    _reap_child(pid, 0)
+    return COMMAND_FAILED
+
+
+def _reap_child(pid: int, options: int) -> tuple[int, int]:
+    # Return (pid, exit code), or (0, 0) while the child is still running.
+    # With an inherited SIGCHLD=SIG_IGN the kernel reaps children itself and
+    # waitpid raises ECHILD; like subprocess, treat that as exit status 0.
+    try:
+        waited_pid, status = os.waitpid(pid, options)
+    except ChildProcessError:
+        return pid, 0
+    if not waited_pid:
+        return 0, 0
+    return waited_pid, os.waitstatus_to_exitcode(status)
+
+
+def _subprocess_command(command: Sequence[str]) -> str:
+    # `subprocess` is only needed off POSIX, so it is imported here.
+    import subprocess
+
     try:
         completed = subprocess.run(
             command,
             check=False,
             stdout=subprocess.DEVNULL,
             stderr=subprocess.DEVNULL,
-            timeout=2,
+            timeout=RUN_COMMAND_TIMEOUT,
         )
     except OSError:
         # Command/binary missing or not executable.
-        return False
+        return COMMAND_MISSING
     except subprocess.SubprocessError:
         # Timeout or subprocess runtime failure.
-        return False
+        return COMMAND_FAILED
 
     # Only explicit exit code 0 counts as success.
-    return completed.returncode == 0
+    return COMMAND_OK if completed.returncode == 0 else COMMAND_FAILED
 
 
-def windows_candidate_wav_paths() -> list[Path]:
-    # Candidate ordering is intentional:
-    # 1) explicit user override
-    # 2) common system media files
+@functools.lru_cache(maxsize=1)
+def _windows_candidate_wav_paths(wav_override: str, windir: str) -> tuple[Path, ...]:
+    # Keyed on the env values that shape the list, so a changed override
+    # still takes effect while repeated calls reuse the built paths.
     candidates: list[Path] = []
-
-    wav_override = os.environ.get("CODEX_NOTIFY_WAV")
     if wav_override:
         candidates.append(Path(wav_override).expanduser())
-
-    windir = os.environ.get("WINDIR") or os.environ.get("SystemRoot")
     if windir:
         media_root = Path(windir).expanduser() / "Media"
         for filename in WINDOWS_MEDIA_FILENAMES:
             candidates.append(media_root / filename)
+    return tuple(candidates)
+
 
-    return candidates
+def windows_candidate_wav_paths() -> list[Path]:
+    # Candidate ordering is intentional:
+    # 1) explicit user override
+    # 2) common system media files
+    wav_override = os.environ.get("CODEX_NOTIFY_WAV") or ""
+    windir = os.environ.get("WINDIR") or os.environ.get("SystemRoot") or ""
+    return list(_windows_candidate_wav_paths(wav_override, windir))
 
 
 def _load_winsound() -> Any | None:
-    # `winsound` exists on Windows only; load lazily for cross-platform execution.
+    # `winsound` exists on Windows only; import via importlib for cross-platform typing.
     try:
         import importlib
 
@@ -147,18 +292,26 @@ def _load_winsound() -> Any | None:
         return None
 
 
+# Loaded once at import, and only on Windows, so non-Windows hooks never pay
+# for a failed import search and Windows backends skip repeated lookups.
+_WINSOUND: Any | None = _load_winsound() if _SYSTEM == "windows" else None
+
+
 def play_windows_wav_file() -> tuple[bool, str]:
     # Prefer synchronous WAV playback so hook process lifetime does not
-    # terminate sound output early on short-lived invocations.
-    winsound = _load_winsound()
+    # terminate sound output early on short-lived invocations (SND_ASYNC
+    # would stop as soon as this hook exits). SND_NODEFAULT makes an
+    # unplayable file fail instead of silently playing the system default.
+    winsound = _WINSOUND
     if winsound is None:
         return False, "windows:winsound-unavailable"
+    flags = winsound.SND_FILENAME | winsound.SND_NODEFAULT
 
     for wav_path in windows_candidate_wav_paths():
         try:
-            if not wav_path.is_file():
+            if not os.path.isfile(wav_path):
                 continue
-            winsound.PlaySound(str(wav_path), winsound.SND_FILENAME)
+            winsound.PlaySound(str(wav_path), flags)
             return True, f"windows:winsound.PlaySound(file:{wav_path.name})"
         except (RuntimeError, OSError):
             continue
@@ -168,7 +321,7 @@ def play_windows_wav_file() -> tuple[bool, str]:
 
 def play_windows_beep_chime() -> tuple[bool, str]:
     # Deterministic three-note chime avoids user sound-scheme dependency.
-    winsound = _load_winsound()
+    winsound = _WINSOUND
     if winsound is None:
         return False, "windows:winsound-unavailable"
 
@@ -180,6 +333,40 @@ def play_windows_beep_chime() -> tuple[bool, str]:
         return False, "windows:winsound.Beep-failed"
 
 
+@functools.lru_cache(maxsize=1)
+def _load_kernel32_beep() -> Any | None:
+    # Direct Win32 `Beep` lets the chime play in-process when `winsound` is
+    # missing, without paying for a PowerShell launch. Resolved once.
+    try:
+        import importlib
+
+        ctypes = importlib.import_module("ctypes")
+        win_dll = getattr(ctypes, "WinDLL", None)
+        if win_dll is None:
+            return None
+        beep = win_dll("kernel32", use_last_error=True).Beep
+    except (ImportError, OSError, AttributeError):
+        return None
+
+    beep.argtypes = (ctypes.c_uint, ctypes.c_uint)
+    beep.restype = ctypes.c_int
+    return beep
+
+
+def play_windows_kernel32_chime() -> tuple[bool, str]:
+    # Same three-note chime as the PowerShell fallback, including its short gaps.
+    beep = _load_kernel32_beep()
+    if beep is None:
+        return False, "windows:kernel32-unavailable"
+
+    for index, (frequency, duration) in enumerate(WINDOWS_BEEP_PATTERN):
+        if index:
+            time.sleep(0.04)
+        if not beep(frequency, duration):
+            return False, "windows:kernel32.Beep-failed"
+    return True, "windows:kernel32.Beep(chime)"
+
+
 def play_windows_powershell_chime() -> tuple[bool, str]:
     # PowerShell console beep fallback is useful when winsound backends
     # are unavailable in the current Python runtime.
@@ -188,15 +375,18 @@ def play_windows_powershell_chime() -> tuple[bool, str]:
         "[console]::beep(988,120); Start-Sleep -Milliseconds 40; "
         "[console]::beep(1047,160)"
     )
-    if run_command(["powershell", "-NoProfile", "-Command", script]):
+    status = run_command_status(["powershell", "-NoProfile", "-Command", script])
+    if status == COMMAND_OK:
         return True, "windows:powershell.console-beep"
+    if status == COMMAND_MISSING:
+        return False, "windows:powershell-unavailable"
     return False, "windows:powershell.console-beep-failed"
 
 
 def play_windows_alias_fallback() -> tuple[bool, str]:
     # Alias-based sounds depend on per-user scheme/mixer state, so this is a
     # late fallback rather than primary backend.
-    winsound = _load_winsound()
+    winsound = _WINSOUND
     if winsound is None:
         return False, "windows:winsound-unavailable"
 
@@ -213,45 +403,115 @@ def play_windows_alias_fallback() -> tuple[bool, str]:
         return False, "windows:winsound.alias-failed"
 
 
+def _command_backend(command: Sequence[str], backend: str) -> tuple[bool, str]:
+    # Adapt a plain backend command to the (ok, backend) shape used below;
+    # a missing binary is reported with the "-unavailable" suffix.
+    status = run_command_status(command)
+    if status == COMMAND_MISSING:
+        return False, backend + UNAVAILABLE_SUFFIX
+    return status == COMMAND_OK, backend
+
+
+def _command_backends(
+    commands: tuple[tuple[tuple[str, ...], str], ...],
+) -> list[tuple[str, Callable[[], tuple[bool, str]]]]:
+    # Command backends are keyed by their backend label.
+    return [
+        (backend, functools.partial(_command_backend, command, backend))
+        for command, backend in commands
+    ]
+
+
+def _darwin_backends() -> list[tuple[str, Callable[[], tuple[bool, str]]]]:
+    # macOS: prefer afplay, then AppleScript beep fallback.
+    return _command_backends(_DARWIN_COMMANDS)
+
+
+def _windows_backends() -> list[tuple[str, Callable[[], tuple[bool, str]]]]:
+    # Windows cascade:
+    # 1) deterministic WAV file playback (sync)
+    # 2) deterministic winsound chime
+    # 3) direct kernel32 Beep chime (no child process)
+    # 4) PowerShell console chime
+    # 5) alias/system fallback
+    return [
+        ("windows:wav-file", play_windows_wav_file),
+        ("windows:winsound-chime", play_windows_beep_chime),
+        ("windows:kernel32-chime", play_windows_kernel32_chime),
+        ("windows:powershell-chime", play_windows_powershell_chime),
+        ("windows:alias", play_windows_alias_fallback),
+    ]
+
+
+def _unix_backends() -> list[tuple[str, Callable[[], tuple[bool, str]]]]:
+    # Linux/Unix: try common desktop audio tools.
+    return _command_backends(_UNIX_COMMANDS)
+
+
+# OS-specific backend lists keyed on `_SYSTEM`; anything unknown is treated as Unix.
+_PLATFORM_BACKENDS = {
+    "darwin": _darwin_backends,
+    "windows": _windows_backends,
+}
+
+
+def _backend_cache_path() -> Path:
+    # Optional override mirrors CODEX_NOTIFY_LOG for tests and diagnostics.
+    override = os.environ.get("CODEX_NOTIFY_BACKEND_CACHE")
+    if override:
+        return Path(override).expanduser()
+    return Path.home() / ".codex" / "cache" / "notify_unavailable_backends"
+
+
+def load_unavailable_backends() -> set[str]:
+    # Keys of backends found missing (no binary/module) by a recent run.
+    # The list expires so newly installed tools are picked up again.
+    try:
+        with _backend_cache_path().open(encoding="utf-8") as handle:
+            if time.time() - os.fstat(handle.fileno()).st_mtime > UNAVAILABLE_BACKEND_TTL:
+                return set()
+            return {line.strip() for line in handle if line.strip()}
+    except (OSError, ValueError):
+        return set()
+
+
+def store_unavailable_backends(keys: set[str]) -> None:
+    # Best-effort: a cache that cannot be written only costs extra probes.
+    path = _backend_cache_path()
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text("".join(key + "\n" for key in sorted(keys)), encoding="utf-8")
+    except OSError:
+        pass
+
+
 def try_play_sound() -> bool:
     # Backend strategy:
-    # 1) Try OS-native sound tools first
+    # 1) Try OS-native sound tools first, in fixed priority order
     # 2) Fall back to terminal bell as last resort
+    # Backends a recent run found missing (not merely failing) are skipped,
+    # so steady-state runs do not re-spawn absent tools; a backend that
+    # failed once is still tried first next time.
     set_last_backend("none")
-    system = platform.system().lower()
-
-    if system == "darwin":
-        # macOS: prefer afplay, then AppleScript beep fallback.
-        if run_command(["afplay", "/System/Library/Sounds/Glass.aiff"]):
-            set_last_backend("darwin:afplay")
-            return True
-        if run_command(["osascript", "-e", "beep"]):
-            set_last_backend("darwin:osascript-beep")
-            return True
-    elif system == "windows":
-        # Windows cascade:
-        # 1) deterministic WAV file playback (sync)
-        # 2) deterministic winsound chime
-        # 3) PowerShell console chime
-        # 4) alias/system fallback
-        for backend_fn in (
-            play_windows_wav_file,
-            play_windows_beep_chime,
-            play_windows_powershell_chime,
-            play_windows_alias_fallback,
-        ):
-            ok, backend = backend_fn()
-            if ok:
-                set_last_backend(backend)
-                return True
-    else:
-        # Linux/Unix: try common desktop audio tools.
-        if run_command(["paplay", "/usr/share/sounds/freedesktop/stereo/complete.oga"]):
-            set_last_backend("linux:paplay")
-            return True
-        if run_command(["canberra-gtk-play", "-i", "complete", "-d", "codex"]):
-            set_last_backend("linux:canberra-gtk-play")
-            return True
+    unavailable = load_unavailable_backends()
+    found_unavailable = set(unavailable)
+    played = False
+
+    for key, attempt in _PLATFORM_BACKENDS.get(_SYSTEM, _unix_backends)():
+        if key in unavailable:
+            continue
+        ok, backend = attempt()
+        if ok:
+            set_last_backend(backend)
+            played = True
+            break
+        if backend.endswith(UNAVAILABLE_SUFFIX):
+            found_unavailable.add(key)
+
+    if found_unavailable != unavailable:
+        store_unavailable_backends(found_unavailable)
+    if played:
+        return True
 
     try:
         # Terminal bell fallback keeps behavior usable on minimal systems.
@@ -300,17 +560,24 @@ def event_type(payload: dict[str, object]) -> str | None:
 
 def is_supported_event(event_name: str | None) -> bool:
     # Accept canonical event plus compatible `*-turn-complete` variants.
-    if not isinstance(event_name, str):
-        return False
-    if event_name == SUPPORTED_EVENT:
-        return True
-    return event_name.endswith("-turn-complete")
+    return isinstance(event_name, str) and (
+        event_name in _SUPPORTED_EVENTS or event_name.endswith(_SUPPORTED_EVENT_SUFFIX)
+    )
 
 
 def main(argv: list[str] | None = None) -> int:
     # Never hard-fail the caller: always exit 0 and log locally on errors.
     # Notification hooks should not break core Codex operations.
     args = argv if argv is not None else sys.argv
+    try:
+        return handle_invocation(args)
+    finally:
+        # Buffered debug events are written once, however the run ends.
+        flush_debug_events()
+
+
+def handle_invocation(args: list[str]) -> int:
+    # Core hook flow; debug events logged here are flushed by main().
     log_debug_event("invoke", argv_len=len(args))
     if len(args) < 2:
         # Missing payload is non-fatal: log and return success.
@@ -318,11 +585,19 @@ def main(argv: list[str] | None = None) -> int:
         log_debug_event("missing-payload")
         return 0
 
+    # Every supported event name contains "turn-complete"; without it (or a
+    # JSON escape that could spell it) the payload cannot be ours, so skip
+    # parsing entirely.
+    raw_payload = args[1]
+    if "turn-complete" not in raw_payload and "\\" not in raw_payload:
+        log_debug_event("ignored-event-fast")
+        return 0
+
     # Parse input payload from argv[1].
-    payload = parse_payload(args[1])
+    payload = parse_payload(raw_payload)
     if payload is None:
         # Invalid payload is ignored to avoid interrupting Codex flow.
-        log_debug_event("invalid-payload", raw=args[1][:512])
+        log_debug_event("invalid-payload", raw=raw_payload[:512])
         return 0
 
     event_name = event_type(payload)
@@ -337,6 +612,11 @@ def main(argv: list[str] | None = None) -> int:
         log_debug_event("ignored-event", event_name=event_name)
         return 0
 
+    # A backend can hang (e.g. synchronous PlaySound) until the hook is
+    # killed, which skips main()'s final flush and atexit; write what we
+    # have so far before playing.
+    flush_debug_events()
+
     # Best-effort sound output: log if all backends fail, but still exit 0.
     success = try_play_sound()
     log_debug_event(
@@ -350,5 +630,9 @@ def main(argv: list[str] | None = None) -> int:
     return 0
 
 
+# Events logged outside main() (e.g. by importers) are still written at exit.
+atexit.register(flush_debug_events)
+
+
 if __name__ == "__main__":
     raise SystemExit(main())
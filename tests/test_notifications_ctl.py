@@ -1,6 +1,9 @@
 from __future__ import annotations
 
+import contextlib
+import errno
 import importlib.util
+import io
 import json
 import os
 import subprocess
@@ -8,6 +11,7 @@ import sys
 import tempfile
 import unittest
 from pathlib import Path
+from unittest import mock
 
 import tomllib
 
@@ -20,26 +24,26 @@ SCRIPT_PATH = (
     / "scripts"
     / "notifications_ctl.py"
 )
-STATE_MODULE_PATH = (
-    REPO_ROOT
-    / ".agents"
-    / "skills"
-    / "notifications"
-    / "scripts"
-    / "notifications_state.py"
-)
 
 
-def load_state_module():
-    spec = importlib.util.spec_from_file_location("notifications_state", STATE_MODULE_PATH)
+def load_ctl_module():
+    # The control script imports `notifications_state` by name, exactly as it
+    # does when run from its own directory.
+    scripts_dir = str(SCRIPT_PATH.parent)
+    if scripts_dir not in sys.path:
+        sys.path.insert(0, scripts_dir)
+    spec = importlib.util.spec_from_file_location("notifications_ctl", SCRIPT_PATH)
     if spec is None or spec.loader is None:
-        raise RuntimeError("Unable to load notifications_state module spec")
+        raise RuntimeError("Unable to load notifications_ctl module spec")
     module = importlib.util.module_from_spec(spec)
     spec.loader.exec_module(module)
     return module
 
 
-SKILL_NOTIFY_COMMAND = load_state_module().SKILL_NOTIFY_COMMAND
+CTL_MOD = load_ctl_module()
+# Reuse the state module the control script already imported instead of
+# executing notifications_state.py a second time.
+SKILL_NOTIFY_COMMAND = sys.modules["notifications_state"].SKILL_NOTIFY_COMMAND
 
 
 def parse_json_stdout(raw_stdout: str) -> dict[str, str]:
@@ -49,21 +53,25 @@ def parse_json_stdout(raw_stdout: str) -> dict[str, str]:
 
 
 class NotificationsCtlTests(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        # One temp directory per class; each test works in its own subdirectory.
+        cls.class_tempdir = tempfile.TemporaryDirectory()
+        cls.addClassCleanup(cls.class_tempdir.cleanup)
+        # The notify script stub is never modified, so all tests share it.
+        cls.notify_script_path = Path(cls.class_tempdir.name) / "notify_event.py"
+        cls.notify_script_path.write_text("#!/usr/bin/env python3\n", encoding="utf-8")
+
     def setUp(self) -> None:
-        self.tempdir = tempfile.TemporaryDirectory()
-        self.addCleanup(self.tempdir.cleanup)
+        self.root = Path(self.class_tempdir.name) / self._testMethodName
+        self.root.mkdir()
 
-        root = Path(self.tempdir.name)
-        self.config_path = root / "config.toml"
-        self.snapshot_path = root / "snapshot.json"
-        self.notify_script_path = root / "notify_event.py"
-        self.notify_script_path.write_text("#!/usr/bin/env python3\n", encoding="utf-8")
+        self.config_path = self.root / "config.toml"
+        self.snapshot_path = self.root / "snapshot.json"
 
-    def run_ctl(self, *args: str, config_path: Path | None = None) -> tuple[int, dict[str, str]]:
+    def ctl_args(self, *args: str, config_path: Path | None = None) -> list[str]:
         cfg = config_path if config_path is not None else self.config_path
-        command = [
-            sys.executable,
-            str(SCRIPT_PATH),
+        return [
             *args,
             "--config",
             str(cfg),
@@ -72,21 +80,42 @@ class NotificationsCtlTests(unittest.TestCase):
             "--notify-script",
             str(self.notify_script_path),
         ]
+
+    def run_ctl(self, *args: str, config_path: Path | None = None) -> tuple[int, dict[str, str]]:
+        # In-process call to main(); same argv and JSON output as the CLI.
+        buffer = io.StringIO()
+        with contextlib.redirect_stdout(buffer):
+            try:
+                return_code = CTL_MOD.main(self.ctl_args(*args, config_path=config_path))
+            except SystemExit as exc:
+                return_code = exc.code if isinstance(exc.code, int) else 1
+        return return_code, parse_json_stdout(buffer.getvalue())
+
+    def run_ctl_process(
+        self,
+        *args: str,
+        env: dict[str, str] | None = None,
+    ) -> tuple[int, dict[str, str]]:
+        # Fresh interpreter for end-to-end checks and import-time behavior.
         completed = subprocess.run(
-            command,
+            [sys.executable, str(SCRIPT_PATH), *self.ctl_args(*args)],
             check=False,
             capture_output=True,
             text=True,
+            env=env,
         )
         payload = parse_json_stdout(completed.stdout)
         return completed.returncode, payload
 
     def read_config(self) -> dict[str, object]:
-        if not self.config_path.exists() or not self.config_path.read_text(
-            encoding="utf-8"
-        ).strip():
+        # One read; missing and blank configs both mean "no keys".
+        try:
+            data = self.config_path.read_bytes()
+        except FileNotFoundError:
+            return {}
+        if not data.strip():
             return {}
-        return tomllib.loads(self.config_path.read_text(encoding="utf-8"))
+        return tomllib.loads(data.decode("utf-8"))
 
     def test_command_parsing(self) -> None:
         return_code, payload = self.run_ctl("on")
@@ -107,6 +136,53 @@ class NotificationsCtlTests(unittest.TestCase):
         self.assertEqual(payload["status"], "invalid-input")
         self.assertIn("Usage: $notifications on|off", payload["next_action"])
 
+        return_code, payload = self.run_ctl("on", "--unknown")
+        self.assertEqual(return_code, 2)
+        self.assertEqual(payload["status"], "invalid-input")
+
+        return_code, payload = self.run_ctl("on", "--help")
+        self.assertEqual(return_code, 2)
+        self.assertEqual(payload["rationale"], "Help requested.")
+
+    def test_unambiguous_option_prefixes_are_accepted(self) -> None:
+        buffer = io.StringIO()
+        with contextlib.redirect_stdout(buffer):
+            return_code = CTL_MOD.main(
+                [
+                    "on",
+                    "--conf",
+                    str(self.config_path),
+                    f"--snap={self.snapshot_path}",
+                    "--notify",
+                    str(self.notify_script_path),
+                ]
+            )
+        self.assertEqual(return_code, 0)
+        self.assertEqual(parse_json_stdout(buffer.getvalue())["status"], "applied")
+        self.assertTrue(self.snapshot_path.exists())
+
+        return_code, payload = self.run_ctl("on", "--he")
+        self.assertEqual(return_code, 2)
+        self.assertEqual(payload["rationale"], "Help requested.")
+
+    def test_inline_option_values_are_accepted(self) -> None:
+        completed = subprocess.run(
+            [
+                sys.executable,
+                str(SCRIPT_PATH),
+                "on",
+                f"--config={self.config_path}",
+                f"--snapshot={self.snapshot_path}",
+                f"--notify-script={self.notify_script_path}",
+            ],
+            check=False,
+            capture_output=True,
+            text=True,
+        )
+        self.assertEqual(completed.returncode, 0)
+        self.assertEqual(parse_json_stdout(completed.stdout)["status"], "applied")
+        self.assertTrue(self.snapshot_path.exists())
+
     def test_on_from_clean_config(self) -> None:
         return_code, payload = self.run_ctl("on")
         self.assertEqual(return_code, 0)
@@ -170,8 +246,77 @@ class NotificationsCtlTests(unittest.TestCase):
         self.assertEqual(return_code, 0)
         self.assertEqual(payload["status"], "already-applied")
 
+    def test_on_cache_is_ignored_after_config_edit_and_cleared_by_off(self) -> None:
+        cache_path = self.snapshot_path.with_suffix(".parsecache.json")
+
+        return_code, payload = self.run_ctl("on")
+        self.assertEqual(payload["status"], "applied")
+        self.assertTrue(cache_path.exists())
+
+        self.config_path.write_text("[broken\n", encoding="utf-8")
+        return_code, payload = self.run_ctl("on")
+        self.assertEqual(return_code, 4)
+        self.assertEqual(payload["status"], "failed")
+
+        self.config_path.write_text("", encoding="utf-8")
+        return_code, payload = self.run_ctl("off")
+        self.assertEqual(return_code, 0)
+        self.assertFalse(cache_path.exists())
+
+    def test_already_on_config_is_recorded_in_cache(self) -> None:
+        cache_path = self.snapshot_path.with_suffix(".parsecache.json")
+        notify_value = json.dumps(
+            [SKILL_NOTIFY_COMMAND, str(self.notify_script_path.resolve())]
+        )
+        self.config_path.write_text(
+            f"notify = {notify_value}\n\n"
+            "[tui]\n"
+            'notifications = ["approval-requested"]\n'
+            'notification_method = "bel"\n',
+            encoding="utf-8",
+        )
+
+        return_code, payload = self.run_ctl("on")
+        self.assertEqual(return_code, 0)
+        self.assertEqual(payload["status"], "already-applied")
+        self.assertFalse(self.snapshot_path.exists())
+        self.assertTrue(cache_path.exists())
+
+    def test_missing_tomlkit_only_fails_commands_that_edit(self) -> None:
+        # Shadow tomlkit with a module that fails to import.
+        shadow_dir = self.root / "shadow"
+        shadow_dir.mkdir()
+        (shadow_dir / "tomlkit.py").write_text(
+            'raise ImportError("tomlkit blocked for test")\n', encoding="utf-8"
+        )
+        env = {**os.environ, "PYTHONPATH": str(shadow_dir)}
+
+        return_code, payload = self.run_ctl_process("off", env=env)
+        self.assertEqual(return_code, 0)
+        self.assertEqual(payload["status"], "already-applied")
+
+        return_code, payload = self.run_ctl_process("on", env=env)
+        self.assertEqual(return_code, 4)
+        self.assertEqual(payload["status"], "failed")
+        self.assertIn("python3 -m pip install tomlkit", payload["rationale"])
+
     def test_blocked_write_returns_guidance(self) -> None:
-        blocked_dir = Path(self.tempdir.name) / "blocked"
+        denied = PermissionError(errno.EACCES, "Permission denied", str(self.config_path))
+        with mock.patch.object(CTL_MOD, "atomic_write_many", side_effect=denied):
+            return_code, payload = self.run_ctl("on")
+
+        self.assertEqual(return_code, 3)
+        self.assertEqual(payload["status"], "blocked")
+        self.assertIn("sandbox_workspace_write.writable_roots", payload["next_action"])
+        self.assertIn("policy that permits", payload["next_action"])
+        self.assertFalse(self.config_path.exists())
+
+    @unittest.skipIf(os.name == "nt", "directory mode bits do not block writes on Windows")
+    @unittest.skipIf(
+        hasattr(os, "geteuid") and os.geteuid() == 0, "root bypasses directory permissions"
+    )
+    def test_blocked_write_on_read_only_directory(self) -> None:
+        blocked_dir = self.root / "blocked"
         blocked_dir.mkdir(parents=True, exist_ok=True)
         os.chmod(blocked_dir, 0o500)
         self.addCleanup(os.chmod, blocked_dir, 0o700)
@@ -193,6 +338,14 @@ class NotificationsCtlTests(unittest.TestCase):
         self.assertEqual(payload["status"], "failed")
         self.assertIn("Failed to parse config TOML", payload["rationale"])
 
+    def test_off_on_malformed_config_returns_exit_code_4(self) -> None:
+        self.config_path.write_text("[broken\n", encoding="utf-8")
+
+        return_code, payload = self.run_ctl("off")
+        self.assertEqual(return_code, 4)
+        self.assertEqual(payload["status"], "failed")
+        self.assertIn("Failed to parse config TOML", payload["rationale"])
+
     def test_off_with_malformed_snapshot_reports_warning_suffix(self) -> None:
         return_code, payload = self.run_ctl("on")
         self.assertEqual(return_code, 0)
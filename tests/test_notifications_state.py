@@ -1,12 +1,13 @@
 from __future__ import annotations
 
+import functools
 import importlib.util
+import tempfile
 import unittest
 from pathlib import Path
 from unittest import mock
 
 import tomlkit
-import tomllib
 
 REPO_ROOT = Path(__file__).resolve().parents[1]
 MODULE_PATH = (
@@ -17,8 +18,11 @@ MODULE_PATH = (
     / "scripts"
     / "notifications_state.py"
 )
+# Resolved once; tests only need a stable absolute notify script path.
+NOTIFY_PATH = Path("/tmp/notify_event.py").resolve()
 
 
+@functools.cache
 def load_module():
     spec = importlib.util.spec_from_file_location("notifications_state", MODULE_PATH)
     if spec is None or spec.loader is None:
@@ -29,10 +33,9 @@ def load_module():
 
 
 def document_to_dict(document) -> dict[str, object]:
-    raw = tomlkit.dumps(document)
-    if not raw.strip():
-        return {}
-    return tomllib.loads(raw)
+    # tomlkit documents unwrap to plain Python values directly; no need to
+    # dump and re-parse the TOML text for each assertion.
+    return document.unwrap()
 
 
 class NotificationsStateTests(unittest.TestCase):
@@ -41,7 +44,7 @@ class NotificationsStateTests(unittest.TestCase):
         cls.mod = load_module()
 
     def test_is_skill_notify_value_accepts_toml_array(self) -> None:
-        notify_path = Path("/tmp/notify_event.py").resolve()
+        notify_path = NOTIFY_PATH
         notify_command = self.mod.SKILL_NOTIFY_COMMAND
         document = tomlkit.parse(
             f'notify = ["{notify_command}", "{notify_path}"]\n'
@@ -50,7 +53,7 @@ class NotificationsStateTests(unittest.TestCase):
         self.assertTrue(self.mod.is_skill_notify_value(document.get("notify"), notify_path))
 
     def test_apply_on_state_is_idempotent_after_first_apply(self) -> None:
-        notify_path = Path("/tmp/notify_event.py").resolve()
+        notify_path = NOTIFY_PATH
         document = tomlkit.document()
         document["model"] = "gpt-5"
 
@@ -64,6 +67,42 @@ class NotificationsStateTests(unittest.TestCase):
         parsed = document_to_dict(document)
         self.assertEqual(parsed["model"], "gpt-5")
 
+    def test_is_target_on_readonly_matches_is_target_on(self) -> None:
+        notify_path = NOTIFY_PATH
+        document = tomlkit.document()
+        self.mod.apply_on_state(document, notify_path)
+        raw = tomlkit.dumps(document)
+
+        self.assertTrue(self.mod.is_target_on_readonly(raw, notify_path))
+        self.assertFalse(self.mod.is_target_on_readonly('model = "gpt-5"\n', notify_path))
+        # Malformed TOML is left to the tomlkit path to report.
+        self.assertFalse(self.mod.is_target_on_readonly("[broken\n", notify_path))
+
+    def test_is_off_readonly_only_when_safe_off_would_not_change(self) -> None:
+        notify_path = NOTIFY_PATH
+        missing_snapshot = Path("/nonexistent/snapshot.json")
+        other_notify = 'notify = ["python3", "/tmp/other_notify.py"]\n'
+        document = tomlkit.document()
+        self.mod.apply_on_state(document, notify_path)
+
+        self.assertTrue(self.mod.is_off_readonly("", missing_snapshot, notify_path))
+        self.assertTrue(self.mod.is_off_readonly(other_notify, missing_snapshot, notify_path))
+        self.assertFalse(
+            self.mod.is_off_readonly(tomlkit.dumps(document), missing_snapshot, notify_path)
+        )
+        # Broken TOML goes to tomlkit, even without any skill-managed text.
+        self.assertFalse(self.mod.is_off_readonly("[broken\n", missing_snapshot, notify_path))
+        # Escapes could spell a managed value.
+        escaped_override = (
+            '[tui]\nnotifications = ["\\u0061pproval-requested"]\nnotification_method = "bel"\n'
+        )
+        self.assertFalse(self.mod.is_off_readonly(escaped_override, missing_snapshot, notify_path))
+
+        with tempfile.TemporaryDirectory() as tempdir:
+            snapshot_path = Path(tempdir) / "snapshot.json"
+            snapshot_path.write_text("{}", encoding="utf-8")
+            self.assertFalse(self.mod.is_off_readonly("", snapshot_path, notify_path))
+
     def test_apply_snapshot_restore_restores_values(self) -> None:
         document = tomlkit.parse(
             'model = "gpt-5"\n'
@@ -87,8 +126,52 @@ class NotificationsStateTests(unittest.TestCase):
         self.assertEqual(parsed["tui"]["notifications"], True)
         self.assertEqual(parsed["tui"]["notification_method"], "auto")
 
+    def test_apply_snapshot_restore_reports_no_change_when_already_restored(self) -> None:
+        original_toml = (
+            'model = "gpt-5"\n'
+            'notify = ["python3", "/tmp/original_notify.py"]\n\n'
+            "[tui]\n"
+            "notifications = true\n"
+            'notification_method = "auto"\n'
+        )
+        document = tomlkit.parse(original_toml)
+        prior_state = {
+            "notify": {"present": True, "value": ["python3", "/tmp/original_notify.py"]},
+            "tui.notifications": {"present": True, "value": True},
+            "tui.notification_method": {"present": True, "value": "auto"},
+        }
+
+        changed = self.mod.apply_snapshot_restore(document, prior_state)
+
+        self.assertFalse(changed)
+        self.assertEqual(tomlkit.dumps(document), original_toml)
+
+    def test_restore_helpers_report_per_key_changes(self) -> None:
+        document = tomlkit.parse('notify = 1\n\n[tui]\nnotification_method = "auto"\n')
+
+        # Same value, different TOML type (`true` vs `1`) is still a change.
+        self.assertTrue(
+            self.mod.restore_key(document, "notify", {"present": True, "value": True})
+        )
+        self.assertFalse(
+            self.mod.restore_key(document, "notify", {"present": True, "value": True})
+        )
+        self.assertFalse(
+            self.mod.restore_tui_key(
+                document, "notification_method", {"present": True, "value": "auto"}
+            )
+        )
+        self.assertFalse(
+            self.mod.restore_tui_key(document, "notifications", {"present": False})
+        )
+        # Removing the last [tui] key also drops the empty table.
+        self.assertTrue(
+            self.mod.restore_tui_key(document, "notification_method", {"present": False})
+        )
+        self.assertEqual(document_to_dict(document), {"notify": True})
+
     def test_apply_safe_off_without_snapshot_is_idempotent(self) -> None:
-        notify_path = Path("/tmp/notify_event.py").resolve()
+        notify_path = NOTIFY_PATH
         notify_command = self.mod.SKILL_NOTIFY_COMMAND
         document = tomlkit.parse(
             'model = "gpt-5"\n'
@@ -110,6 +193,50 @@ class NotificationsStateTests(unittest.TestCase):
         self.assertEqual(parsed["tui"]["notifications"], False)
         self.assertEqual(parsed["tui"]["notification_method"], "bel")
 
+    def test_write_toml_document_skips_unchanged_text(self) -> None:
+        with tempfile.TemporaryDirectory() as tempdir:
+            config_path = Path(tempdir) / "config.toml"
+            raw = 'model = "gpt-5" # keep\n'
+            document = tomlkit.parse(raw)
+
+            self.assertFalse(self.mod.write_toml_document(config_path, document, raw))
+            self.assertFalse(config_path.exists())
+
+            self.assertTrue(self.mod.write_toml_document(config_path, document))
+            self.assertEqual(config_path.read_text(encoding="utf-8"), raw)
+
+    def test_atomic_write_many_skips_fsync_for_advisory_files(self) -> None:
+        with tempfile.TemporaryDirectory() as tempdir:
+            snapshot_path = Path(tempdir) / "snapshot.json"
+            config_path = Path(tempdir) / "nested" / "config.toml"
+
+            with (
+                mock.patch.object(self.mod.os, "fsync") as fsync,
+                mock.patch.object(self.mod, "_fsync_directory") as fsync_directory,
+            ):
+                self.mod.atomic_write_many(
+                    [(snapshot_path, "{}\n"), (config_path, 'model = "gpt-5"\n')],
+                    fsync=True,
+                    advisory=(snapshot_path,),
+                )
+
+            self.assertEqual(fsync.call_count, 1)
+            fsync_directory.assert_called_once_with(config_path.parent)
+            self.assertEqual(snapshot_path.read_text(encoding="utf-8"), "{}\n")
+            self.assertEqual(config_path.read_text(encoding="utf-8"), 'model = "gpt-5"\n')
+            self.assertEqual(sorted(p.name for p in config_path.parent.iterdir()), ["config.toml"])
+
+    def test_snapshot_round_trips_non_ascii_values_as_utf8(self) -> None:
+        prior = {"notify": {"present": True, "value": ["python3", "/tmp/caf\u00e9/notify.py"]}}
+        with tempfile.TemporaryDirectory() as tempdir:
+            snapshot_path = Path(tempdir) / "snapshot.json"
+            self.mod.atomic_write_text(
+                snapshot_path, self.mod.dump_snapshot(Path(tempdir) / "config.toml", prior)
+            )
+
+            self.assertIn("caf\u00e9".encode(), snapshot_path.read_bytes())
+            self.assertEqual(self.mod.load_snapshot(snapshot_path), (prior, None))
+
     def test_capture_prior_state_returns_plain_python_values(self) -> None:
         document = tomlkit.parse(
             'notify = ["python3", "/tmp/original_notify.py"]\n\n'
@@ -133,6 +260,14 @@ class NotificationsStateTests(unittest.TestCase):
             {"present": True, "value": "bel"},
         )
 
+    def test_capture_prior_state_does_not_alias_document(self) -> None:
+        document = tomlkit.parse('notify = ["python3", "/tmp/original_notify.py"]\n')
+
+        prior_state = self.mod.capture_prior_state(document)
+        document["notify"].append("--extra")
+
+        self.assertEqual(prior_state["notify"]["value"], ["python3", "/tmp/original_notify.py"])
+
     def test_resolve_skill_python_command_windows_prefers_sys_executable(self) -> None:
         with (
             mock.patch.object(self.mod.sys, "platform", "win32"),
@@ -1,8 +1,10 @@
 from __future__ import annotations
 
+import functools
 import importlib.util
 import json
 import os
+import signal
 import tempfile
 import unittest
 from pathlib import Path
@@ -19,6 +21,7 @@ MODULE_PATH = (
 )
 
 
+@functools.cache
 def load_module():
     spec = importlib.util.spec_from_file_location("notify_event", MODULE_PATH)
     if spec is None or spec.loader is None:
@@ -32,15 +35,21 @@ class NotifyEventTests(unittest.TestCase):
     @classmethod
     def setUpClass(cls) -> None:
         cls.mod = load_module()
+        cls.class_tempdir = tempfile.TemporaryDirectory()
+        cls.addClassCleanup(cls.class_tempdir.cleanup)
 
     def setUp(self) -> None:
-        self.tempdir = tempfile.TemporaryDirectory()
-        self.addCleanup(self.tempdir.cleanup)
+        # Per-test subdirectory of the class-wide temp directory.
+        self.root = Path(self.class_tempdir.name) / self._testMethodName
+        self.root.mkdir()
 
-        self.log_path = Path(self.tempdir.name) / "notify_hook.log"
+        self.log_path = self.root / "notify_hook.log"
         self.previous_log_override = os.environ.get("CODEX_NOTIFY_LOG")
         self.previous_wav_override = os.environ.get("CODEX_NOTIFY_WAV")
+        self.previous_cache_override = os.environ.get("CODEX_NOTIFY_BACKEND_CACHE")
         os.environ["CODEX_NOTIFY_LOG"] = str(self.log_path)
+        self.backend_cache_path = self.root / "notify_backend"
+        os.environ["CODEX_NOTIFY_BACKEND_CACHE"] = str(self.backend_cache_path)
 
         self.addCleanup(self._restore_env)
 
@@ -55,11 +64,18 @@ class NotifyEventTests(unittest.TestCase):
         else:
             os.environ["CODEX_NOTIFY_WAV"] = self.previous_wav_override
 
+        if self.previous_cache_override is None:
+            os.environ.pop("CODEX_NOTIFY_BACKEND_CACHE", None)
+        else:
+            os.environ["CODEX_NOTIFY_BACKEND_CACHE"] = self.previous_cache_override
+
     def read_log_events(self) -> list[dict[str, object]]:
-        if not self.log_path.exists():
+        try:
+            data = self.log_path.read_bytes()
+        except FileNotFoundError:
             return []
-        lines = self.log_path.read_text(encoding="utf-8").splitlines()
-        return [json.loads(line) for line in lines if line.strip()]
+        # json.loads accepts the UTF-8 bytes lines directly.
+        return [json.loads(line) for line in data.splitlines() if line.strip()]
 
     def test_event_type_prefers_type(self) -> None:
         payload = {
@@ -80,46 +96,88 @@ class NotifyEventTests(unittest.TestCase):
         self.assertTrue(self.mod.is_supported_event("agent-turn-complete"))
         self.assertTrue(self.mod.is_supported_event("assistant-turn-complete"))
         self.assertFalse(self.mod.is_supported_event("approval-requested"))
+        self.assertFalse(self.mod.is_supported_event(None))
 
     def test_main_accepts_type_payload(self) -> None:
-        calls: list[str] = []
-
-        def fake_try_play_sound() -> bool:
-            calls.append("played")
-            return True
-
-        original = self.mod.try_play_sound
-        self.mod.try_play_sound = fake_try_play_sound
-        try:
+        with mock.patch.object(self.mod, "try_play_sound", return_value=True) as play_mock:
             exit_code = self.mod.main(
                 ["notify_event.py", json.dumps({"type": "agent-turn-complete"})]
             )
-        finally:
-            self.mod.try_play_sound = original
 
         self.assertEqual(exit_code, 0)
-        self.assertEqual(calls, ["played"])
+        self.assertEqual(play_mock.call_count, 1)
 
-    def test_main_ignores_unknown_type(self) -> None:
-        calls: list[str] = []
+    def test_main_writes_buffered_events_once(self) -> None:
+        with (
+            mock.patch.object(self.mod, "try_play_sound", return_value=True),
+            mock.patch.object(
+                self.mod, "_debug_log_targets", wraps=self.mod._debug_log_targets
+            ) as targets_mock,
+        ):
+            self.mod.main(["notify_event.py", json.dumps({"type": "agent-turn-complete"})])
+
+        event_names = [str(item.get("event")) for item in self.read_log_events()]
+        self.assertEqual(event_names, ["invoke", "parsed-payload", "play-attempt"])
+        # One write before playing sound, one for the play result.
+        self.assertEqual(targets_mock.call_count, 2)
+        self.assertRegex(
+            str(self.read_log_events()[0]["ts"]),
+            r"^\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d{2}\.\d{6}\+00:00$",
+        )
+        self.assertEqual(self.mod._PENDING_DEBUG_EVENTS, [])
+
+    def test_main_flushes_events_before_playing_sound(self) -> None:
+        seen_before_play: list[str] = []
 
-        def fake_try_play_sound() -> bool:
-            calls.append("played")
+        def fake_play() -> bool:
+            seen_before_play.extend(str(item.get("event")) for item in self.read_log_events())
             return True
 
-        original = self.mod.try_play_sound
-        self.mod.try_play_sound = fake_try_play_sound
-        try:
+        with mock.patch.object(self.mod, "try_play_sound", side_effect=fake_play):
+            self.mod.main(["notify_event.py", json.dumps({"type": "agent-turn-complete"})])
+
+        self.assertEqual(seen_before_play, ["invoke", "parsed-payload"])
+
+    def test_main_without_sound_writes_once(self) -> None:
+        with (
+            mock.patch.object(self.mod, "try_play_sound") as play_mock,
+            mock.patch.object(
+                self.mod, "_debug_log_targets", wraps=self.mod._debug_log_targets
+            ) as targets_mock,
+        ):
+            self.mod.main(["notify_event.py", json.dumps({"type": "approval-requested"})])
+
+        play_mock.assert_not_called()
+        self.assertEqual(targets_mock.call_count, 1)
+
+    def test_flush_creates_missing_log_directory(self) -> None:
+        nested_log = self.root / "nested" / "log" / "notify_hook.log"
+        os.environ["CODEX_NOTIFY_LOG"] = str(nested_log)
+
+        self.mod.main(["notify_event.py"])
+
+        lines = nested_log.read_text(encoding="utf-8").splitlines()
+        event_names = [json.loads(line)["event"] for line in lines]
+        self.assertEqual(event_names, ["invoke", "missing-payload"])
+
+    def test_main_ignores_unknown_type(self) -> None:
+        with mock.patch.object(self.mod, "try_play_sound", return_value=True) as play_mock:
             exit_code = self.mod.main(["notify_event.py", json.dumps({"type": "other"})])
-        finally:
-            self.mod.try_play_sound = original
 
         self.assertEqual(exit_code, 0)
-        self.assertEqual(calls, [])
+        self.assertFalse(play_mock.called)
+        event_names = [str(item.get("event")) for item in self.read_log_events()]
+        self.assertEqual(event_names, ["invoke", "ignored-event-fast"])
+
+    def test_main_parses_escaped_payload_before_ignoring(self) -> None:
+        with mock.patch.object(self.mod, "try_play_sound", return_value=True) as play_mock:
+            self.mod.main(["notify_event.py", '{"type": "agent-turn-\\u0063omplete"}'])
+
+        self.assertTrue(play_mock.called)
 
     def test_try_play_sound_windows_prefers_first_successful_backend(self) -> None:
         with (
-            mock.patch.object(self.mod.platform, "system", return_value="Windows"),
+            mock.patch.object(self.mod, "_SYSTEM", "windows"),
             mock.patch.object(
                 self.mod,
                 "play_windows_wav_file",
@@ -142,9 +200,133 @@ class NotifyEventTests(unittest.TestCase):
         self.assertEqual(self.mod.get_last_backend(), "windows:winsound.Beep(chime)")
         self.assertTrue(beep_mock.called)
         self.assertFalse(ps_mock.called)
+        self.assertEqual(self.mod.load_unavailable_backends(), set())
+
+    def play_linux_with_statuses(self, statuses: dict[str, str]) -> list[str]:
+        # Run try_play_sound on the Unix backend list with scripted command
+        # results; returns the binaries that were spawned.
+        spawned: list[str] = []
+
+        def fake_run_command_status(command: tuple[str, ...]) -> str:
+            spawned.append(command[0])
+            return statuses[command[0]]
+
+        with (
+            mock.patch.object(self.mod, "_SYSTEM", "linux"),
+            mock.patch.object(
+                self.mod, "run_command_status", side_effect=fake_run_command_status
+            ),
+        ):
+            self.assertTrue(self.mod.try_play_sound())
+        return spawned
+
+    def test_try_play_sound_higher_priority_backend_recovers(self) -> None:
+        ok, failed = self.mod.COMMAND_OK, self.mod.COMMAND_FAILED
+
+        spawned = self.play_linux_with_statuses({"paplay": failed, "canberra-gtk-play": ok})
+        self.assertEqual(spawned, ["paplay", "canberra-gtk-play"])
+
+        # A one-off failure is not remembered: paplay is tried first again.
+        spawned = self.play_linux_with_statuses({"paplay": ok, "canberra-gtk-play": ok})
+        self.assertEqual(spawned, ["paplay"])
+        self.assertEqual(self.mod.get_last_backend(), "linux:paplay")
+
+    def test_try_play_sound_skips_missing_backend_until_cache_expires(self) -> None:
+        ok, missing = self.mod.COMMAND_OK, self.mod.COMMAND_MISSING
+        statuses = {"paplay": missing, "canberra-gtk-play": ok}
+
+        self.assertEqual(self.play_linux_with_statuses(statuses), ["paplay", "canberra-gtk-play"])
+        self.assertEqual(self.mod.load_unavailable_backends(), {"linux:paplay"})
+        self.assertEqual(self.play_linux_with_statuses(statuses), ["canberra-gtk-play"])
+
+        expired = self.backend_cache_path.stat().st_mtime - self.mod.UNAVAILABLE_BACKEND_TTL - 1
+        os.utime(self.backend_cache_path, (expired, expired))
+        statuses["paplay"] = ok
+        self.assertEqual(self.play_linux_with_statuses(statuses), ["paplay"])
+        self.assertEqual(self.mod.load_unavailable_backends(), set())
+
+    def test_try_play_sound_windows_prefers_kernel32_over_powershell(self) -> None:
+        with (
+            mock.patch.object(self.mod, "_SYSTEM", "windows"),
+            mock.patch.object(
+                self.mod,
+                "play_windows_wav_file",
+                return_value=(False, "windows:winsound-unavailable"),
+            ),
+            mock.patch.object(
+                self.mod,
+                "play_windows_beep_chime",
+                return_value=(False, "windows:winsound-unavailable"),
+            ),
+            mock.patch.object(
+                self.mod,
+                "_load_kernel32_beep",
+                return_value=mock.Mock(return_value=1),
+            ),
+            mock.patch.object(self.mod.time, "sleep"),
+            mock.patch.object(self.mod, "play_windows_powershell_chime") as ps_mock,
+        ):
+            success = self.mod.try_play_sound()
+
+        self.assertTrue(success)
+        self.assertEqual(self.mod.get_last_backend(), "windows:kernel32.Beep(chime)")
+        self.assertFalse(ps_mock.called)
+
+    @unittest.skipUnless(hasattr(os, "posix_spawnp"), "posix_spawnp unavailable")
+    def test_run_command_reports_exit_status_and_missing_binary(self) -> None:
+        self.assertTrue(self.mod.run_command(("true",)))
+        self.assertFalse(self.mod.run_command(("false",)))
+        self.assertFalse(self.mod.run_command(("codex-notify-missing-binary",)))
+        self.assertEqual(
+            self.mod.run_command_status(("codex-notify-missing-binary",)),
+            self.mod.COMMAND_MISSING,
+        )
+
+    @unittest.skipUnless(hasattr(os, "posix_spawnp"), "posix_spawnp unavailable")
+    def test_run_command_succeeds_with_sigchld_ignored(self) -> None:
+        # Auto-reaped children make waitpid raise ECHILD; that is not a failure.
+        previous = signal.signal(signal.SIGCHLD, signal.SIG_IGN)
+        self.addCleanup(signal.signal, signal.SIGCHLD, previous)
+
+        self.assertTrue(self.mod.run_command(("true",)))
+
+    @unittest.skipUnless(Path("/proc/self/status").exists(), "needs Linux /proc")
+    def test_run_command_restores_default_signal_handling(self) -> None:
+        # The hook interpreter ignores SIGPIPE/SIGXFSZ; the child must not.
+        status_path = self.root / "child_status"
+        self.assertTrue(
+            self.mod.run_command(
+                ("sh", "-c", f"grep '^SigIgn:' /proc/self/status > '{status_path}'")
+            )
+        )
+        ignored = int(status_path.read_text(encoding="utf-8").split()[1], 16)
+        for signum in (signal.SIGPIPE, signal.SIGXFSZ):
+            self.assertFalse(ignored & (1 << (signum - 1)), signal.Signals(signum).name)
+
+    @unittest.skipUnless(hasattr(os, "posix_spawnp"), "posix_spawnp unavailable")
+    def test_run_command_kills_command_after_timeout(self) -> None:
+        with mock.patch.object(self.mod, "RUN_COMMAND_TIMEOUT", 0.05):
+            self.assertFalse(self.mod.run_command(("sleep", "5")))
+
+    def test_play_windows_wav_file_follows_changed_override(self) -> None:
+        first_wav = self.root / "a.wav"
+        second_wav = self.root / "b.wav"
+        first_wav.write_bytes(b"RIFF")
+        second_wav.write_bytes(b"RIFF")
+        fake_winsound = mock.Mock(SND_FILENAME=0x20000, SND_NODEFAULT=0x2)
+
+        with mock.patch.object(self.mod, "_WINSOUND", fake_winsound):
+            os.environ["CODEX_NOTIFY_WAV"] = str(first_wav)
+            first = self.mod.play_windows_wav_file()
+            os.environ["CODEX_NOTIFY_WAV"] = str(second_wav)
+            second = self.mod.play_windows_wav_file()
+
+        self.assertEqual(first, (True, "windows:winsound.PlaySound(file:a.wav)"))
+        self.assertEqual(second, (True, "windows:winsound.PlaySound(file:b.wav)"))
+        fake_winsound.PlaySound.assert_called_with(str(second_wav), 0x20002)
 
     def test_main_invalid_json_logs_invalid_payload_event(self) -> None:
-        exit_code = self.mod.main(["notify_event.py", "{bad json"])
+        exit_code = self.mod.main(["notify_event.py", '{"type": "agent-turn-complete"'])
         self.assertEqual(exit_code, 0)
 
         events = self.read_log_events()